@@ -0,0 +1,286 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+'''
+Benchmarks the project import path (pom discovery, parsing, classpath
+resolution and merging) on synthetic multi-module trees, outside of
+Sublime Text:
+
+    python bench/bench_import.py --modules 10,100,1000 --depth 3
+
+Every stage runs in a fresh process, reporting its wall time, peak RSS and
+the number of filesystem calls (stat, lstat, listdir, open), process spawns
+and, on Linux, read/write syscalls (from /proc/self/io).  Classpaths come
+from a fake mvn script printing canned classpaths.  POSIX only.
+'''
+
+import os, sys, time, json, math, shutil, subprocess, tempfile, optparse, __builtin__
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+# the stub sublime module, then the package itself
+sys.path.insert(0, os.path.dirname(bench_dir))
+sys.path.insert(0, bench_dir)
+
+stages = ['nearest', 'parse', 'parse_header', 'discover', 'index', 'classpath', 'merge']
+
+fake_mvn = '''#!/bin/sh
+echo "[INFO] Scanning for projects..."
+echo "[INFO] --- maven-dependency-plugin:build-classpath (default-cli) ---"
+cat .bench-classpath
+echo
+echo "[INFO] BUILD SUCCESS"
+'''
+
+pom_template = '''<?xml version="1.0" encoding="UTF-8"?>
+<project xmlns="http://maven.apache.org/POM/4.0.0">
+  <modelVersion>4.0.0</modelVersion>
+%(parent)s  <groupId>org.bench</groupId>
+  <artifactId>%(artifact_id)s</artifactId>
+  <version>1.0-SNAPSHOT</version>
+  <packaging>%(packaging)s</packaging>
+%(modules)s  <dependencies>
+%(dependencies)s  </dependencies>
+</project>
+'''
+
+dependency_template = '''    <dependency>
+      <groupId>org.bench.lib%(lib)d</groupId>
+      <artifactId>lib%(lib)d</artifactId>
+      <version>1.%(version)d</version>
+    </dependency>
+'''
+
+'''
+Writes a reactor of module_count modules, depth levels deep, under
+root, each leaf with pom_dependencies dependencies (and as many jars on its
+canned classpath, some shared and some in conflicting versions).  Returns
+the module directories.
+'''
+def generate_tree(root, module_count, depth, pom_dependencies):
+    fanout = max(2, int(math.ceil(module_count ** (1.0 / max(depth, 1)))))
+    module_dirs = []
+    repository = os.path.join(root, '.bench-repository')
+
+    # modules still to be written, aggregators reserve the slots of their children
+    budget = [module_count - 1]
+
+    def write_module(module_dir, artifact_id, parent_id, level):
+        module_dirs.append(module_dir)
+        children = []
+        if level < depth:
+            for idx in range(min(fanout, budget[0])):
+                children.append('%s-%d' % (artifact_id, idx))
+            budget[0] -= len(children)
+
+        os.makedirs(os.path.join(module_dir, 'target', 'classes'))
+        source_dir = os.path.join(module_dir, 'src', 'main', 'java', 'org', 'bench')
+        os.makedirs(source_dir)
+        open(os.path.join(source_dir, 'Module.java'), 'w').write('package org.bench;\nclass Module {}\n')
+
+        number = len(module_dirs)
+        dependencies = []
+        classpath = []
+        for idx in range(pom_dependencies):
+            lib = (number * 7 + idx * 13) % (pom_dependencies * 4)
+            version = (number + idx) % 3
+            dependencies.append(dependency_template % { 'lib': lib, 'version': version })
+            classpath.append(os.path.join(repository, 'org', 'bench', 'lib%d' % lib, 'lib%d' % lib,
+                '1.%d' % version, 'lib%d-1.%d.jar' % (lib, version)))
+        parent = ''
+        if parent_id:
+            parent = '  <parent>\n    <groupId>org.bench</groupId>\n    <artifactId>%s</artifactId>\n    <version>1.0-SNAPSHOT</version>\n  </parent>\n' % parent_id
+        modules = ''
+        if children:
+            modules = '  <modules>\n%s  </modules>\n' % ''.join(['    <module>%s</module>\n' % child for child in children])
+        pom_file = open(os.path.join(module_dir, 'pom.xml'), 'w')
+        pom_file.write(pom_template % { 'parent': parent, 'artifact_id': artifact_id,
+            'packaging': children and 'pom' or 'jar', 'modules': modules, 'dependencies': ''.join(dependencies) })
+        pom_file.close()
+        open(os.path.join(module_dir, '.bench-classpath'), 'w').write(os.pathsep.join(classpath))
+
+        for child in children:
+            write_module(os.path.join(module_dir, child), child, artifact_id, level + 1)
+
+    write_module(root, 'root', None, 0)
+
+    bin_dir = os.path.join(root, '.bench-bin')
+    os.makedirs(bin_dir)
+    mvn_file = open(os.path.join(bin_dir, 'mvn'), 'w')
+    mvn_file.write(fake_mvn)
+    mvn_file.close()
+    os.chmod(os.path.join(bin_dir, 'mvn'), 0755)
+    return module_dirs
+
+'''
+Counts calls to the filesystem functions (and process spawns) the import
+path goes through.
+'''
+class CallCounter(object):
+    def __init__(self):
+        self.counts = {}
+
+    def wrap(self, owner, name, key):
+        original = getattr(owner, name)
+        counts = self.counts
+        counts[key] = 0
+        def counting(*args, **kwargs):
+            counts[key] += 1
+            return original(*args, **kwargs)
+        setattr(owner, name, counting)
+
+    def install(self):
+        self.wrap(os, 'stat', 'stat')
+        self.wrap(os, 'lstat', 'lstat')
+        self.wrap(os, 'listdir', 'listdir')
+        self.wrap(__builtin__, 'open', 'open')
+        self.wrap(subprocess.Popen, '_execute_child', 'spawn')
+
+def proc_io():
+    try:
+        io_file = open('/proc/self/io')
+    except IOError:
+        return {}
+    counters = {}
+    for line in io_file:
+        name, value = line.split(':')
+        if name in ('syscr', 'syscw'):
+            counters[name] = int(value)
+    io_file.close()
+    return counters
+
+def peak_rss_kb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # bytes there, kilobytes elsewhere
+        peak /= 1024
+    return peak
+
+'''
+Runs one stage on the tree at root (in this process) and returns its measurements.
+'''
+def run_stage(stage, root):
+    from utils.mvn import pom, classpath, watcher
+    module_dirs = json.load(open(os.path.join(root, '.bench-modules')))
+    os.environ['PATH'] = os.path.join(root, '.bench-bin') + os.pathsep + os.environ['PATH']
+    generator = pom.PomProjectGeneratorThread(root, None)
+    canned_classpaths = []
+    if stage == 'merge':
+        for module_dir in module_dirs:
+            canned_classpaths.append(open(os.path.join(module_dir, '.bench-classpath')).read().split(os.pathsep))
+
+    base_rss = peak_rss_kb()
+    io_before = proc_io()
+    counter = CallCounter()
+    counter.install()
+    start = time.time()
+
+    if stage == 'nearest':
+        for module_dir in module_dirs:
+            pom.find_nearest_pom(os.path.join(module_dir, 'src', 'main', 'java', 'org', 'bench', 'Module.java'))
+    elif stage == 'parse':
+        for module_dir in module_dirs:
+            pom.PomHandler().parse(os.path.join(module_dir, 'pom.xml'))
+    elif stage == 'parse_header':
+        for module_dir in module_dirs:
+            pom.PomHandler().parse_header(os.path.join(module_dir, 'pom.xml'))
+    elif stage == 'discover':
+        generator.find_pom_paths()
+    elif stage == 'index':
+        index = watcher.PomIndex()
+        index.add_folder(root)
+        for module_dir in module_dirs:
+            index.nearest(os.path.join(module_dir, 'src', 'main', 'java', 'org', 'bench', 'Module.java'))
+    elif stage == 'classpath':
+        generator.resolve_classpaths(module_dirs)
+    elif stage == 'merge':
+        merged = classpath.MergedClasspath()
+        for module_dir, module_classpath in zip(module_dirs, canned_classpaths):
+            merged.add(os.path.join(module_dir, 'target', 'classes'))
+            merged.update(module_classpath)
+
+    wall = time.time() - start
+    calls = dict(counter.counts)
+    io_after = proc_io()
+    result = { 'wall': wall, 'base_rss_kb': base_rss, 'peak_rss_kb': peak_rss_kb(), 'calls': calls }
+    for name in io_after:
+        result['calls'][name] = io_after[name] - io_before[name]
+    return result
+
+def format_result(module_count, stage, result):
+    calls = result['calls']
+    call_names = ['stat', 'lstat', 'listdir', 'open', 'spawn', 'syscr', 'syscw']
+    return '%7d  %-12s %9.3f %9d %9d  %s' % (module_count, stage, result['wall'],
+        result['peak_rss_kb'], result['peak_rss_kb'] - result['base_rss_kb'],
+        ' '.join(['%s=%d' % (name, calls[name]) for name in call_names if name in calls]))
+
+def main():
+    parser = optparse.OptionParser(usage = '%prog [options]')
+    parser.add_option('--modules', default = '10,100,1000,5000', help = 'comma separated module counts (default %default)')
+    parser.add_option('--depth', type = 'int', default = 3, help = 'levels of nested aggregators (default %default)')
+    parser.add_option('--dependencies', type = 'int', default = 20, help = 'dependencies per pom (default %default)')
+    parser.add_option('--stages', default = ','.join(stages), help = 'stages to run (default %default)')
+    parser.add_option('--max-spawn-modules', type = 'int', default = 1000,
+        help = 'skip the classpath stage (one fake mvn per module) above this many modules (default %default)')
+    parser.add_option('--json', action = 'store_true', help = 'print results as JSON lines')
+    parser.add_option('--keep', action = 'store_true', help = 'keep the generated trees')
+    # internal: run a single stage on an existing tree
+    parser.add_option('--run-stage', help = optparse.SUPPRESS_HELP)
+    parser.add_option('--tree', help = optparse.SUPPRESS_HELP)
+    options, args = parser.parse_args()
+
+    if options.run_stage:
+        print json.dumps(run_stage(options.run_stage, options.tree))
+        return
+
+    if not options.json:
+        print '%7s  %-12s %9s %9s %9s  %s' % ('modules', 'stage', 'wall (s)', 'peak (KB)', 'delta (KB)', 'calls')
+    for module_count in [int(count) for count in options.modules.split(',')]:
+        root = tempfile.mkdtemp(prefix = 'sublime-maven-bench-')
+        try:
+            module_dirs = generate_tree(os.path.join(root, 'reactor'), module_count, options.depth, options.dependencies)
+            tree = os.path.join(root, 'reactor')
+            json.dump(module_dirs, open(os.path.join(tree, '.bench-modules'), 'w'))
+            for stage in options.stages.split(','):
+                if stage == 'classpath' and module_count > options.max_spawn_modules:
+                    continue
+                stage_proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--run-stage', stage, '--tree', tree],
+                    stdout = subprocess.PIPE)
+                stage_output = stage_proc.communicate()[0]
+                if stage_proc.returncode != 0:
+                    print 'stage %s failed on %d modules' % (stage, module_count)
+                    continue
+                # the last line: the stage itself may print
+                result = json.loads(stage_output.strip().splitlines()[-1])
+                if options.json:
+                    print json.dumps(dict(result, modules = module_count, stage = stage))
+                else:
+                    print format_result(module_count, stage, result)
+                sys.stdout.flush()
+        finally:
+            if options.keep:
+                print 'trees kept in %s' % root
+            else:
+                shutil.rmtree(root)
+
+if __name__ == '__main__':
+    main()
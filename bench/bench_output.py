@@ -0,0 +1,247 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+'''
+Replays a Maven log through the build output path of maven.py, outside of
+Sublime Text: a replay_mvn.py process stands in for mvn, so the output goes
+through AsyncMavenProcess's reader threads, MavenCommand's output buffers
+and flush_output/append_data into a stub output panel.  Callbacks scheduled
+with sublime.set_timeout run on a simulated UI thread whose busy time is
+measured.
+
+    python bench/bench_output.py --log build.log --rate 20
+    python bench/bench_output.py --generate-mb 200 --max-lines 10000
+
+Reports throughput, end to end latency (from replay_mvn.py writing a probe
+line to it reaching the panel), UI thread busy time and memory growth.
+Linux (for /proc memory figures) or any POSIX system.
+'''
+
+import os, sys, time, json, heapq, threading, tempfile, shutil, optparse, re
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(bench_dir))
+sys.path.insert(0, bench_dir)
+
+import sublime
+
+probe_pattern = re.compile(r'\[BENCH-PROBE\] ([0-9.]+)')
+
+'''
+Single-threaded stand-in for Sublime's UI thread: runs set_timeout
+callbacks in due order and records how long each one takes.
+'''
+class UiLoop(object):
+    def __init__(self):
+        self.lock = threading.Condition()
+        self.queue = []
+        self.sequence = 0
+        self.busy = 0.0
+        self.busy_per_second = {}
+        self.longest = 0.0
+        self.callbacks = 0
+
+    def set_timeout(self, callback, delay):
+        with self.lock:
+            self.sequence += 1
+            heapq.heappush(self.queue, (time.time() + delay / 1000.0, self.sequence, callback))
+            self.lock.notify()
+
+    def run_until(self, done, timeout):
+        deadline = time.time() + timeout
+        while not done() and time.time() < deadline:
+            with self.lock:
+                if not self.queue:
+                    self.lock.wait(0.1)
+                    continue
+                due = self.queue[0][0]
+                if due > time.time():
+                    self.lock.wait(due - time.time())
+                    continue
+                callback = heapq.heappop(self.queue)[2]
+            start = time.time()
+            callback()
+            duration = time.time() - start
+            self.busy += duration
+            self.longest = max(self.longest, duration)
+            self.callbacks += 1
+            second = int(start)
+            self.busy_per_second[second] = self.busy_per_second.get(second, 0.0) + duration
+
+'''
+Output panel recording the latency of every probe line appended to it.
+'''
+class ProbingView(sublime.View):
+    def __init__(self, name = ''):
+        sublime.View.__init__(self, name)
+        self.latencies = []
+        self.peak_size = 0
+
+    def insert(self, edit, point, text):
+        now = time.time()
+        if '[BENCH-PROBE]' in text:
+            for match in probe_pattern.finditer(text):
+                self.latencies.append(now - float(match.group(1)))
+        inserted = sublime.View.insert(self, edit, point, text)
+        self.peak_size = max(self.peak_size, self.length)
+        return inserted
+
+class ProbingWindow(sublime.Window):
+    def get_output_panel(self, name):
+        if name not in self.panels:
+            self.panels[name] = ProbingView(name)
+        return self.panels[name]
+
+def rss_kb():
+    try:
+        status_file = open('/proc/self/status')
+    except IOError:
+        return None
+    rss = None
+    for line in status_file:
+        if line.startswith('VmRSS:'):
+            rss = int(line.split()[1])
+    status_file.close()
+    return rss
+
+'''
+Writes about size_mb MB of Maven -X style output: reactor and mojo headers,
+long [DEBUG] classpath dumps, compiler errors and surefire results.
+'''
+def generate_log(path, size_mb):
+    log_file = open(path, 'w')
+    written = 0
+    module = 0
+    jars = ':'.join(['/home/dev/.m2/repository/org/bench/lib%d/lib%d/1.%d/lib%d-1.%d.jar' % (idx, idx, idx % 3, idx, idx % 3)
+        for idx in range(40)])
+    while written < size_mb * 2**20:
+        module += 1
+        lines = ['[INFO] ------------------------------------------------------------------------\n',
+            '[INFO] Building module-%d 1.0-SNAPSHOT\n' % module,
+            '[INFO] ------------------------------------------------------------------------\n',
+            '[INFO] --- maven-compiler-plugin:3.1:compile (default-compile) @ module-%d ---\n' % module]
+        for idx in range(200):
+            lines.append('[DEBUG]   (f) classpathElements = [%s]\n' % jars)
+            lines.append('[DEBUG] Configuring mojo org.apache.maven.plugins:maven-compiler-plugin:3.1:compile from plugin realm ClassRealm[plugin>org.apache.maven.plugins:maven-compiler-plugin:3.1, parent: sun.misc.Launcher$AppClassLoader@%x]\n' % (module * 1000 + idx))
+        lines.append('[ERROR] /home/dev/src/module-%d/src/main/java/org/bench/Module.java:[%d,17] cannot find symbol\n' % (module, module % 300 + 1))
+        lines.append('[INFO] --- maven-surefire-plugin:2.12.4:test (default-test) @ module-%d ---\n' % module)
+        lines.append('Running org.bench.Module%dTest\n' % module)
+        lines.append('Tests run: 12, Failures: 0, Errors: 0, Skipped: 1, Time elapsed: 0.%03d sec\n' % (module % 1000))
+        chunk = ''.join(lines)
+        log_file.write(chunk)
+        written += len(chunk)
+    log_file.close()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def main():
+    parser = optparse.OptionParser(usage = '%prog (--log FILE | --generate-mb N) [options]')
+    parser.add_option('--log', help = 'recorded Maven output to replay')
+    parser.add_option('--generate-mb', type = 'float', help = 'replay a generated -X style log of about this many MB')
+    parser.add_option('--rate', type = 'float', default = 0, help = 'replay rate in MB/s, 0 for unthrottled (default %default)')
+    parser.add_option('--probe-interval', type = 'float', default = 100, help = 'ms between latency probes (default %default)')
+    parser.add_option('--max-lines', type = 'int', default = 0, help = 'maven_output_max_lines (default %default: unbounded)')
+    parser.add_option('--timeout', type = 'float', default = 3600, help = 'give up after this many seconds (default %default)')
+    parser.add_option('--json', action = 'store_true', help = 'print the results as JSON')
+    options, args = parser.parse_args()
+    if not options.log and not options.generate_mb:
+        parser.error('one of --log or --generate-mb is required')
+
+    work_dir = tempfile.mkdtemp(prefix = 'sublime-maven-bench-output-')
+    try:
+        log_path = options.log
+        if not log_path:
+            log_path = os.path.join(work_dir, 'generated.log')
+            generate_log(log_path, options.generate_mb)
+        log_size = os.path.getsize(log_path)
+
+        ui_loop = UiLoop()
+        sublime.set_timeout = ui_loop.set_timeout
+        sublime.packages_path = lambda: os.path.join(work_dir, 'Packages')
+        import maven
+
+        maven.settings.set('maven_output_max_lines', options.max_lines)
+        # replay_mvn.py <log> <rate> <probe interval> takes the place of mvn
+        maven.maven_executables['mvn'] = (sys.executable, sys.executable, 'M2_HOME')
+        maven.invalidate_launch_configs()
+
+        pom_dir = os.path.join(work_dir, 'project')
+        os.makedirs(pom_dir)
+        window = ProbingWindow()
+        command = maven.MavenCommand(window)
+
+        memory_samples = [rss_kb()]
+        def sample_memory():
+            memory_samples.append(rss_kb())
+            ui_loop.set_timeout(sample_memory, 500)
+        ui_loop.set_timeout(sample_memory, 500)
+
+        start = time.time()
+        command.launch_build(pom_dir, [os.path.join(bench_dir, 'replay_mvn.py'), log_path,
+            str(options.rate * 2**20), str(options.probe_interval)])
+        ui_loop.run_until(lambda: not command.builds, options.timeout)
+        wall = time.time() - start
+        memory_samples.append(rss_kb())
+
+        view = window.panels.values()[0]
+        memory_samples = [sample for sample in memory_samples if sample != None]
+        busy_seconds = ui_loop.busy_per_second.values()
+        result = {
+            'bytes': log_size,
+            'wall': wall,
+            'throughput_mb_s': log_size / 2.0**20 / wall,
+            'latency_p50': percentile(view.latencies, 0.5),
+            'latency_p95': percentile(view.latencies, 0.95),
+            'latency_max': max(view.latencies or [0.0]),
+            'probes': len(view.latencies),
+            'ui_busy': ui_loop.busy,
+            'ui_busy_fraction': ui_loop.busy / wall,
+            'ui_busy_max_per_second': max(busy_seconds or [0.0]),
+            'ui_longest_callback': ui_loop.longest,
+            'ui_callbacks': ui_loop.callbacks,
+            'rss_start_kb': memory_samples and memory_samples[0],
+            'rss_peak_kb': memory_samples and max(memory_samples),
+            'rss_end_kb': memory_samples and memory_samples[-1],
+            'panel_chars_peak': view.peak_size,
+            'panel_chars_end': view.size()
+        }
+        if options.json:
+            print json.dumps(result)
+        else:
+            print 'replayed %.1f MB in %.2fs (%.1f MB/s)' % (log_size / 2.0**20, wall, result['throughput_mb_s'])
+            print 'latency: p50 %.1f ms, p95 %.1f ms, max %.1f ms over %d probes' % (result['latency_p50'] * 1000,
+                result['latency_p95'] * 1000, result['latency_max'] * 1000, result['probes'])
+            print 'UI thread: %.2fs busy (%.0f%%), at most %.0f ms in any second, longest callback %.1f ms, %d callbacks' % (
+                ui_loop.busy, result['ui_busy_fraction'] * 100, result['ui_busy_max_per_second'] * 1000,
+                ui_loop.longest * 1000, ui_loop.callbacks)
+            if memory_samples:
+                print 'RSS: %d KB at start, %d KB peak, %d KB at end' % (result['rss_start_kb'], result['rss_peak_kb'], result['rss_end_kb'])
+            print 'panel: %d chars at most, %d at end' % (view.peak_size, view.size())
+    finally:
+        shutil.rmtree(work_dir)
+
+if __name__ == '__main__':
+    main()
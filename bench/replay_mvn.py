@@ -0,0 +1,65 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+'''
+Stands in for mvn in bench_output.py: writes a recorded Maven log to stdout
+
+    python replay_mvn.py <log file> <bytes per second, 0: unthrottled> <probe interval (ms)>
+
+in line-aligned chunks, with a "[BENCH-PROBE] <time>" line every probe
+interval so the receiving end can measure its latency.
+'''
+
+import sys, time, os
+
+def main():
+    log_path, rate, probe_interval = sys.argv[1], float(sys.argv[2]), float(sys.argv[3]) / 1000
+    out = os.fdopen(sys.stdout.fileno(), 'wb', 0)
+    log_file = open(log_path, 'rb')
+    start = time.time()
+    written = 0
+    next_probe = start
+    chunk = []
+    chunk_size = 0
+    for line in log_file:
+        chunk.append(line)
+        chunk_size += len(line)
+        if chunk_size < 8192:
+            continue
+        now = time.time()
+        if now >= next_probe:
+            chunk.append(('[BENCH-PROBE] %.6f\n' % now).encode('ascii'))
+            next_probe = now + probe_interval
+        out.write(b''.join(chunk))
+        written += chunk_size
+        chunk = []
+        chunk_size = 0
+        if rate > 0:
+            ahead = start + written / rate - time.time()
+            if ahead > 0:
+                time.sleep(ahead)
+    chunk.append(('[BENCH-PROBE] %.6f\n' % time.time()).encode('ascii'))
+    out.write(b''.join(chunk))
+    log_file.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+# Minimal stand-in for Sublime Text's sublime module, enough to import and
+# drive utils.mvn and maven.py outside of the editor (see bench_import.py
+# and bench_output.py).
+
+import os, tempfile
+
+ENCODED_POSITION = 1
+TRANSIENT = 4
+
+class Settings(dict):
+    def get(self, name, default = None):
+        return dict.get(self, name, default)
+
+    def set(self, name, value):
+        self[name] = value
+
+    def add_on_change(self, key, callback):
+        pass
+
+    def clear_on_change(self, key):
+        pass
+
+class Region(object):
+    def __init__(self, a, b = None):
+        if b == None:
+            b = a
+        self.a = a
+        self.b = b
+
+    def begin(self):
+        return min(self.a, self.b)
+
+    def end(self):
+        return max(self.a, self.b)
+
+'''
+Text buffer kept as a list of appended chunks, so appending to (and erasing
+the start of) a very large output panel stays cheap.
+'''
+class View(object):
+    def __init__(self, name = ''):
+        self.name = name
+        self.chunks = []
+        self.length = 0
+        self.newlines = 0
+        self.view_settings = Settings()
+        self.selection = []
+        self.change_count_ = 0
+
+    def settings(self):
+        return self.view_settings
+
+    def id(self):
+        return id(self)
+
+    def file_name(self):
+        return None
+
+    def begin_edit(self, *args):
+        return object()
+
+    def end_edit(self, edit):
+        pass
+
+    def set_read_only(self, read_only):
+        pass
+
+    def size(self):
+        return self.length
+
+    def change_count(self):
+        return self.change_count_
+
+    def insert(self, edit, point, text):
+        if point != self.length:
+            raise NotImplementedError('only appending is supported')
+        self.chunks.append(text)
+        self.length += len(text)
+        self.newlines += text.count('\n')
+        self.change_count_ += 1
+        return len(text)
+
+    def erase(self, edit, region):
+        if region.begin() != 0:
+            raise NotImplementedError('only erasing from the start is supported')
+        remaining = region.end()
+        while remaining > 0 and self.chunks:
+            chunk = self.chunks[0]
+            if len(chunk) <= remaining:
+                self.chunks.pop(0)
+                removed = chunk
+            else:
+                self.chunks[0] = chunk[remaining:]
+                removed = chunk[:remaining]
+            remaining -= len(removed)
+            self.length -= len(removed)
+            self.newlines -= removed.count('\n')
+        self.change_count_ += 1
+
+    def substr(self, region):
+        return u''.join(self.chunks)[region.begin():region.end()]
+
+    def rowcol(self, point):
+        if point == self.length:
+            last_chunk = self.chunks and self.chunks[-1] or u''
+            return (self.newlines, len(last_chunk) - last_chunk.rfind('\n') - 1)
+        text = u''.join(self.chunks)[:point]
+        return (text.count('\n'), len(text) - text.rfind('\n') - 1)
+
+    def text_point(self, row, col):
+        point = 0
+        for chunk in self.chunks:
+            lines = chunk.count('\n')
+            if lines < row:
+                row -= lines
+                point += len(chunk)
+                continue
+            offset = 0
+            while row > 0:
+                offset = chunk.index('\n', offset) + 1
+                row -= 1
+            return point + offset + col
+        return self.length
+
+    def show(self, point):
+        pass
+
+    def sel(self):
+        return Selection(self.selection)
+
+class Selection(object):
+    def __init__(self, regions):
+        self.regions = regions
+
+    def clear(self):
+        del self.regions[:]
+
+    def add(self, region):
+        self.regions.append(region)
+
+class Window(object):
+    def __init__(self):
+        self.panels = {}
+        self.commands = []
+
+    def id(self):
+        return id(self)
+
+    def get_output_panel(self, name):
+        if name not in self.panels:
+            self.panels[name] = View(name)
+        return self.panels[name]
+
+    def run_command(self, command, args = None):
+        self.commands.append((command, args))
+
+    def active_view(self):
+        return None
+
+    def folders(self):
+        return []
+
+def load_settings(name):
+    return Settings()
+
+def packages_path():
+    return os.path.join(tempfile.gettempdir(), 'sublime-maven-bench-packages')
+
+# callbacks run synchronously, there is no UI thread to defer them to
+def set_timeout(callback, delay):
+    callback()
+
+def status_message(message):
+    pass
+
+def error_message(message):
+    print 'ERROR: %s' % message
+
+def active_window():
+    return None
+
+def windows():
+    return []
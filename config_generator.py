@@ -34,6 +34,7 @@ def generate_config():
         [
             { "caption": "Maven: Run install", "command": "maven", "args": {"paths": [], "goals": ["install"]} },
             { "caption": "Maven: Run clean install", "command": "maven", "args": {"paths": [], "goals": ["clean", "install"]} },
+            { "caption": "Maven: Run incremental install", "command": "maven", "args": {"paths": [], "goals": ["install"], "incremental": True} },
             { "caption": "Maven: Test", "command": "maven", "args": {"paths": [], "goals": ["test"], "props": ["-DskipTests=false", "-Dtest=$CLASS"]} },
             { "caption": "Maven: Exec:java", "command": "maven", "args": {"paths": [], "goals": ["compile", "exec:java"], "props": ["-Dexec.mainClass=$CLASS"]} },
             { "caption": "Maven: Run ...", "command": "maven", "args": {"paths": [], "goals": []} }
@@ -58,6 +59,11 @@ def generate_config():
             "command": "import_maven_projects",
             "args": { "paths": [] }
         })
+    maven_cmd_entry_list.append({
+            "caption": "Update Project from changed POMs in Path",
+            "command": "import_maven_projects",
+            "args": { "paths": [], "incremental": True }
+        })
 
     menu_cmd_list = [
             { "caption": "-" },
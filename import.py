@@ -24,19 +24,31 @@ import sublime, sublime_plugin
 import os
 import string
 from utils import ui
+from utils.mvn import store
 from utils.mvn import pom
+from utils.mvn import classpath
+from utils.mvn import resolver
+from utils.mvn import manifest
 reload(ui)
+reload(store)
+reload(classpath)
 reload(pom)
+reload(resolver)
+reload(manifest)
 
 '''
 ImportMavenProjectsCommand: creates a *.sublime-project file with folders added for each pom.xml path found starting at a root directory.
 File is created as a new view and must be then saved if deemed suitable.
+With incremental, only modules whose pom changed since the last generation are
+regenerated, and merged into the existing <dir name>.sublime-project of the path.
 '''
 class ImportMavenProjectsCommand(sublime_plugin.WindowCommand):
     long_project_names = None
     project_per_pom = None
+    incremental = False
 
-    def run(self, paths):
+    def run(self, paths, incremental = False):
+        self.incremental = incremental
         settings = sublime.load_settings('Preferences.sublime-settings')
         self.long_project_names = settings.get('long_project_names', None)
         self.project_per_pom = settings.get('project_per_pom', None)
@@ -82,7 +94,19 @@ class ImportMavenProjectsCommand(sublime_plugin.WindowCommand):
 
 
     def run_project_generator(self):
-        thread = pom.PomProjectGeneratorThread(self.target_path, self.window, self.long_project_names, self.project_per_pom)
+        maven_settings = sublime.load_settings('Maven.sublime-settings')
+        m2_settings = maven_settings.get('m2_settings')
+        classpath_cache = None
+        if maven_settings.get('maven_classpath_cache', True):
+            classpath_cache = classpath.ClasspathCache(os.path.join(sublime.packages_path(), 'User', 'Maven.classpath-cache'))
+        offline_resolver = None
+        if maven_settings.get('maven_offline_classpath', True):
+            offline_resolver = resolver.resolve_classpath
+        project_manifest = manifest.ProjectManifest(os.path.join(sublime.packages_path(), 'User', 'Maven.project-manifest'))
+        thread = pom.PomProjectGeneratorThread(self.target_path, self.window, self.long_project_names, self.project_per_pom,
+            m2_settings, classpath_cache, maven_settings.get('maven_reactor_classpath', False),
+            maven_settings.get('maven_classpath_workers'), maven_settings.get('maven_exclude_patterns'),
+            maven_settings.get('maven_stop_at_leaf_modules', False), offline_resolver, project_manifest, self.incremental)
         thread.start()
         progress_str = 'Generating project configuration file'
         finished_str = 'Finished generating project configuration file'
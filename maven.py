@@ -24,11 +24,26 @@ import sublime, sublime_plugin
 import os
 import sys
 import thread
+import signal
 import functools
 import re
 import subprocess
+import time
+import threading
 from utils.mvn import pom
+from utils.mvn import output
+from utils.mvn import incremental
+from utils.mvn import profiler
+from utils.mvn import testmap
+from utils.mvn import javasrc
+from utils.mvn import watcher
 reload(pom)
+reload(output)
+reload(incremental)
+reload(profiler)
+reload(testmap)
+reload(javasrc)
+reload(watcher)
 
 settings = sublime.load_settings('Maven.sublime-settings')
 
@@ -44,9 +59,110 @@ def get_setting(name, default=None):
       return v
 
 file_regex_pattern = '^\[ERROR\] ([A-Z]?[:]?[^\[]+):\[([0-9]+),([0-9]+)\] (.*)'
-nt_bad_file_regex_pattern = '^\[ERROR\] ([A-Z]{0}[:]{0}[^\:]+\.java)(.*)$'
-# pattern matching windows file path WITHOUT drive letter
-# nt_bad_file_regex_pattern = re.compile('(.*\n\[ERROR\] )([A-Z]{0}[:]{0}[^\:]+\.java)(.*)')
+
+# executable per execution backend: (posix, windows, home env var)
+maven_executables = {
+    'mvn': ('mvn', 'mvn.bat', 'M2_HOME'),
+    'mvnd': ('mvnd', 'mvnd.cmd', 'MVND_HOME')
+}
+
+# BuildReport of the latest build, per window id
+build_reports = {}
+
+# path of the latest build's full log (see maven_output_max_lines), per window id
+build_logs = {}
+
+# (change count, class name) of the last $CLASS lookup, per view id
+java_class_cache = {}
+
+build_history = None
+
+# PomWatcherThread feeding pom.pom_index, stopped when the plugin is reloaded
+try:
+    pom_watcher.stop()
+except NameError:
+    pass
+pom_watcher = None
+pom.pom_index = None
+
+def get_build_log_dir():
+    return os.path.join(sublime.packages_path(), 'User', 'Maven.build-logs')
+
+def get_build_history():
+    global build_history
+    if build_history == None:
+        build_history = profiler.BuildHistory(os.path.join(sublime.packages_path(), 'User', 'Maven.build-history'))
+    return build_history
+
+# resolved (base command list, child environment) per executable and the
+# m2_settings/maven_env_vars it was resolved with (these may come from project
+# settings), computed on first use and dropped whenever Maven.sublime-settings changes
+launch_configs = {}
+launch_configs_lock = threading.Lock()
+
+def invalidate_launch_configs():
+    with launch_configs_lock:
+        launch_configs.clear()
+
+settings.clear_on_change('maven_launch_configs')
+settings.add_on_change('maven_launch_configs', invalidate_launch_configs)
+
+def get_launch_config(executable):
+    m2_settings = get_setting('m2_settings')
+    maven_env_vars = get_setting('maven_env_vars')
+    key = (executable, m2_settings, repr(sorted((maven_env_vars or {}).items())))
+    with launch_configs_lock:
+        if key not in launch_configs:
+            launch_configs[key] = resolve_launch_config(executable, m2_settings, maven_env_vars)
+        return launch_configs[key]
+
+def resolve_launch_config(executable, m2_settings, maven_env_vars):
+
+    env = {}
+    if maven_env_vars:
+        for env_var, value in maven_env_vars.iteritems():
+            env[env_var.upper()] = value
+
+    # add /usr/local/bin to the path (for some reason not present through sublime)
+    if os.name == 'posix':
+        env['PATH'] = os.environ['PATH'] + os.pathsep + '/usr/local/bin'
+
+    posix_cmd, nt_cmd, home_var = maven_executables[executable]
+    m2_home = None
+    if home_var in env:
+        env['PATH'] += os.pathsep + env[home_var]
+        m2_home = env[home_var]
+
+    proc_env = os.environ.copy()
+    proc_env.update(env)
+    for k, v in proc_env.iteritems():
+        proc_env[k] = os.path.expandvars(v.decode(sys.getfilesystemencoding())).encode(sys.getfilesystemencoding())
+
+    # on windows: use mvn.bat
+    maven_cmd = None
+    if os.name == 'nt':
+        maven_cmd = [nt_cmd]
+    else:
+        maven_cmd = [posix_cmd]
+
+    if m2_home:
+        maven_cmd[0] = m2_home + '/bin/' + maven_cmd[0]
+
+    cmd_list = maven_cmd[:]
+
+    if m2_settings:
+        cmd_list += ["-s"]
+        cmd_list += [m2_settings]
+    return cmd_list, proc_env
+
+# process output is coalesced and written to the panel every output_flush_interval
+# ms, in slices of output_flush_max_bytes for at most output_flush_budget ms of UI
+# time per flush.  A backlog left after that is flushed again after
+# output_flush_backlog_interval ms, so the panel keeps up with fast builds.
+output_flush_interval = 50
+output_flush_max_bytes = 2**16
+output_flush_budget = 20
+output_flush_backlog_interval = 10
 
 '''
 Adapted from Default/exec.py with specific modifications
@@ -64,10 +180,12 @@ Encapsulates subprocess.Popen, forwarding stdout to a supplied
 MavenProcessListener (on a separate thread)
 '''
 class AsyncMavenProcess(object):
-    def __init__(self, listener, goals_and_such):
+    def __init__(self, listener, goals_and_such, executable = 'mvn'):
 
         self.listener = listener
         self.killed = False
+        # stdout lines are timestamped on arrival, before any buffering
+        self.profiler = profiler.BuildProfiler()
 
         # Hide the console window on Windows
         startupinfo = None
@@ -75,71 +193,96 @@ class AsyncMavenProcess(object):
             startupinfo = subprocess.STARTUPINFO()
             startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
 
-        m2_settings = get_setting('m2_settings')
-        maven_env_vars = get_setting('maven_env_vars')
+        cmd_list, proc_env = get_launch_config(executable)
+        cmd_list = cmd_list + goals_and_such
 
-        env = {}
-        if maven_env_vars:
-            for env_var, value in maven_env_vars.iteritems():
-                env[env_var.upper()] = value
-
-        # add /usr/local/bin to the path (for some reason not present through sublime)
-        if os.name == 'posix':
-            env['PATH'] = os.environ['PATH'] + os.pathsep + '/usr/local/bin'
-
-        m2_home = None
-        if 'M2_HOME' in env:
-            env['PATH'] += os.pathsep + env['M2_HOME']
-            m2_home = env['M2_HOME']
-
-        proc_env = os.environ.copy()
-        proc_env.update(env)
-        for k, v in proc_env.iteritems():
-            proc_env[k] = os.path.expandvars(v.decode(sys.getfilesystemencoding())).encode(sys.getfilesystemencoding())
-
-        # on windows: use mvn.bat
-        maven_cmd = None
+        # run the build in its own process group so that kill() also reaches forked
+        # surefire/failsafe JVMs and exec:java children, not just the launcher
+        preexec_fn = None
+        creationflags = 0
         if os.name == 'nt':
-            maven_cmd = ['mvn.bat']
+            creationflags = getattr(subprocess, 'CREATE_NEW_PROCESS_GROUP', 0x00000200)
         else:
-            maven_cmd = ['mvn']
+            preexec_fn = os.setsid
 
-        if m2_home:
-            maven_cmd[0] = m2_home + '/bin/' + maven_cmd[0]
-
-        cmd_list = maven_cmd[:]
-
-        if m2_settings:
-            cmd_list += ["-s"]
-            cmd_list += [m2_settings]
-        cmd_list += goals_and_such
         self.proc = subprocess.Popen(cmd_list, stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE, startupinfo=startupinfo, env=proc_env, shell=False)
+            stderr=subprocess.PIPE, startupinfo=startupinfo, env=proc_env, shell=False,
+            preexec_fn=preexec_fn, creationflags=creationflags)
 
+        self.readers = []
         if self.proc.stdout:
-            thread.start_new_thread(self.read_stdout, ())
+            self.start_reader(self.read_stdout)
 
         if self.proc.stderr:
-            thread.start_new_thread(self.read_stderr, ())
-
+            self.start_reader(self.read_stderr)
+
+    def start_reader(self, target):
+        reader = threading.Thread(target = target)
+        reader.daemon = True
+        reader.start()
+        self.readers.append(reader)
+
+    '''
+    Returns immediately: a reaper thread asks the whole process group to
+    terminate (taskkill blocks on Windows), kills whatever is left after the
+    grace period (maven_kill_grace_period seconds) and joins the reader threads.
+    '''
     def kill(self):
         if not self.killed:
             self.killed = True
-            self.proc.kill()
             self.listener = None
+            reaper = threading.Thread(target=self.reap, args=(get_setting('maven_kill_grace_period', 5),))
+            reaper.daemon = True
+            reaper.start()
+
+    def reap(self, grace_period):
+        self.signal_group(False)
+        time.sleep(grace_period)
+        # the group may outlive the launcher (surefire forks), so kill it regardless
+        self.signal_group(True)
+        for reader in self.readers:
+            reader.join(5)
+        self.readers = [reader for reader in self.readers if reader.is_alive()]
+        if self.readers:
+            print 'WARNING: output of killed Maven process %d still open' % self.proc.pid
+
+    def signal_group(self, force):
+        pid = self.proc.pid
+        try:
+            if os.name == 'nt':
+                startupinfo = subprocess.STARTUPINFO()
+                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+                taskkill = ['taskkill', '/T', '/PID', str(pid)]
+                if force:
+                    taskkill.insert(1, '/F')
+                taskkill_proc = subprocess.Popen(taskkill, startupinfo=startupinfo,
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                taskkill_proc.communicate()
+            else:
+                # the group id is the launcher's pid (os.setsid above)
+                os.killpg(pid, force and signal.SIGKILL or signal.SIGTERM)
+        except OSError:
+            # group already gone
+            pass
 
     def poll(self):
         return self.proc.poll() == None
 
+    def returncode(self):
+        return self.proc.returncode
+
     def read_stdout(self):
         while True:
             data = os.read(self.proc.stdout.fileno(), 2**15)
 
             if data != "":
+                self.profiler.feed(data)
                 if self.listener:
                     self.listener.on_data(self, data)
             else:
                 self.proc.stdout.close()
+                # reap the process so returncode() is known to on_finished
+                self.proc.wait()
                 if self.listener:
                     self.listener.on_finished(self)
                 break
@@ -155,47 +298,112 @@ class AsyncMavenProcess(object):
                 self.proc.stderr.close()
                 break
 
+'''
+Execution backends: start() launches the goals and returns the running
+AsyncMavenProcess, which reports to the given MavenProcessListener.
+MavenProcessBackend starts a fresh mvn JVM for every build.
+'''
+class MavenProcessBackend(object):
+    def start(self, listener, goals_and_such):
+        return AsyncMavenProcess(listener, goals_and_such)
+
+'''
+Runs builds through the Maven Daemon (mvnd, https://github.com/apache/maven-mvnd),
+which keeps warm Maven JVMs (with loaded plugins and JIT-compiled code) between
+builds.  Falls back to a cold mvn if mvnd cannot be started.
+'''
+class MavenDaemonBackend(MavenProcessBackend):
+    def start(self, listener, goals_and_such):
+        try:
+            # plain output instead of mvnd's rich terminal UI
+            return AsyncMavenProcess(listener, ['-Dmvnd.rawStreams=true'] + goals_and_such, 'mvnd')
+        except OSError as e:
+            print 'WARNING: could not start mvnd (%s), using mvn' % e
+            return MavenProcessBackend.start(self, listener, goals_and_such)
+
+execution_backends = {
+    'mvn': MavenProcessBackend(),
+    'mvnd': MavenDaemonBackend()
+}
+
+def get_execution_backend():
+    return execution_backends.get(get_setting('maven_backend', 'mvn'), execution_backends['mvn'])
+
+'''
+One build started by MavenCommand: the process running it and the output
+panel (one per pom directory) it writes to.
+'''
+class MavenBuild(object):
+    def __init__(self, pom_dir, panel_name, goals):
+        self.pom_dir = pom_dir
+        self.panel_name = panel_name
+        self.goals = goals
+        self.proc = None
+        self.output_view = None
+        self.incremental_planner = None
+        # execution backend name, None for the configured maven_backend
+        self.backend = None
+        # because for some reason on win boxes maven strips the drive letters from the path
+        drive_letter = None
+        if os.name == 'nt':
+            drive_letter = pom_dir[0]
+        self.decoder = output.OutputDecoder(drive_letter = drive_letter)
+        self.parser = output.MavenOutputParser()
+        # bounded panel: only the last max_lines lines stay in the panel, everything goes to log
+        self.max_lines = get_setting('maven_output_max_lines', 0)
+        self.log = None
+
 '''
 MavenCommand: executes Apache Maven on the command line.
 Will only be visible if the path argument given is part of a maven project (pom.xml in the current or a parent directory).
+Builds of different pom directories run concurrently (up to maven_max_parallel_builds, further
+builds are queued), each with its own output panel; a new build of the same pom directory
+replaces the running one.
+With incremental set, only the modules changed since the last successful
+incremental build of the same goals (and the modules depending on them) are built.
 '''
 class MavenCommand(sublime_plugin.WindowCommand, MavenProcessListener):
     pomDir = None
     cmd = None
     last_run_goals = ['clean','install']
     env = {}
-    proc = None
     quiet = False
-
-    def run(self, paths, goals, props = None, kill = False):
+    incremental = False
+    backend = None
+    output_buffers = {}
+    output_buffers_lock = threading.Lock()
+
+    def __init__(self, window):
+        sublime_plugin.WindowCommand.__init__(self, window)
+        self.builds = {}
+        self.pending_builds = []
+        self.panel_names = {}
+
+    def run(self, paths, goals, props = None, kill = False, kill_all = False, incremental = False, backend = None):
         if self.window.active_view():
             self.window.active_view().erase_status('_mvn')
 
-        if kill:
-            if self.proc:
-                self.proc.kill()
-                self.proc = None
-                self.append_data(None, "[Cancelled]")
+        if kill_all:
+            self.kill_all_builds()
             return
 
-        if len(paths) == 0 and self.window.active_view().file_name():
+        if len(paths) == 0 and self.window.active_view() and self.window.active_view().file_name():
             paths = [self.window.active_view().file_name()]
+
+        if kill:
+            pom_dir = None
+            if len(paths) > 0:
+                pom_dir = pom.find_nearest_pom(paths[0])
+            self.kill_build(pom_dir)
+            return
+
         self.pomDir = pom.find_nearest_pom(paths[0])
         if not self.pomDir:
             self.window.active_view().set_status('_mvn', 'No pom.xml found for path ' + paths[0])
             return
 
-        if not hasattr(self, 'output_view'):
-            # Try not to call get_output_panel until the regexes are assigned
-            self.output_view = self.window.get_output_panel("exec")
-
-        self.output_view.settings().set("result_file_regex", file_regex_pattern)
-        self.output_view.settings().set("result_base_dir", self.pomDir)
-
-        # Call get_output_panel a second time after assigning the above
-        # settings, so that it'll be picked up as a result buffer
-        self.window.get_output_panel("exec")
-
+        self.incremental = incremental
+        self.backend = backend
         if len(goals) == 0:
             self.window.show_input_panel('mvn',' '.join(self.last_run_goals), self.on_done, None, None)
         else:
@@ -217,105 +425,495 @@ class MavenCommand(sublime_plugin.WindowCommand, MavenProcessListener):
         return str.replace('$CLASS', main_class)
 
     def on_done(self, text):
-        self.window.run_command("show_panel", {"panel": "output.exec"})
+        self.last_run_goals = ' '.join(text.split()).split()
+        if self.incremental:
+            planner = incremental.IncrementalBuildPlanner(self.pomDir, self.last_run_goals,
+                functools.partial(self.on_incremental_planned, self.last_run_goals))
+            planner.start()
+            sublime.status_message('Looking for changed modules')
+        else:
+            self.launch_build(self.pomDir, self.last_run_goals)
 
-        if self.pomDir:
-            os.chdir(self.pomDir)
+    def on_incremental_planned(self, goals, planner):
+        if not planner.full_build and not planner.changed:
+            sublime.status_message('No module changed since the last successful incremental build')
+            return
+        self.launch_build(planner.root_dir, goals + planner.project_list_args(), planner)
+
+    def launch_build(self, pom_dir, goals, incremental_planner = None):
+        build = MavenBuild(pom_dir, self.get_panel_name(pom_dir), goals)
+        build.incremental_planner = incremental_planner
+        build.backend = self.backend
+        build_reports[self.window.id()] = build.parser.report
+
+        running_build = self.builds.get(build.pom_dir)
+        if running_build:
+            # a second build of the same pom has been started before the first one
+            # finished, stop it instead of intermingling the output.
+            self.stop_build(running_build)
+        self.pending_builds = [pending for pending in self.pending_builds if pending.pom_dir != build.pom_dir]
+
+        self.prepare_output_panel(build)
+        self.window.run_command("show_panel", {"panel": "output." + build.panel_name})
+        if len(self.builds) >= get_setting('maven_max_parallel_builds', 2):
+            self.append_data(build, "[Queued]\n")
+            self.pending_builds.append(build)
+        else:
+            self.start_build(build)
 
-        self.last_run_goals = ' '.join(text.split()).split()
+    def start_build(self, build):
+        self.builds[build.pom_dir] = build
+        os.chdir(build.pom_dir)
+
+        if build.max_lines:
+            try:
+                build.log = output.BuildLog(build.pom_dir, get_build_log_dir())
+                build_logs[self.window.id()] = build.log.path
+            except (IOError, OSError) as e:
+                print 'WARNING: cannot write build log in %s: %s' % (build.pom_dir, e)
 
         err_type = OSError
         if os.name == "nt":
             err_type = WindowsError
 
         try:
-            self.proc = AsyncMavenProcess(self, self.last_run_goals)
+            build.proc = execution_backends.get(build.backend, get_execution_backend()).start(self, build.goals)
         except err_type as e:
-            self.append_data(None, str(e) + "\n")
+            self.append_data(build, str(e) + "\n")
             if not self.quiet:
-                self.append_data(None, "[Finished]")
+                self.append_data(build, "[Finished]")
+            del self.builds[build.pom_dir]
+            self.start_pending_builds()
+
+    def start_pending_builds(self):
+        while self.pending_builds and len(self.builds) < get_setting('maven_max_parallel_builds', 2):
+            self.start_build(self.pending_builds.pop(0))
+
+    def stop_build(self, build):
+        if build.log:
+            build.log.close()
+        if build.proc:
+            build.proc.kill()
+            # a flush still scheduled for it finds no build and cleans up after itself
+            with self.output_buffers_lock:
+                self.output_buffers.pop(build.proc, None)
+        if self.builds.get(build.pom_dir) == build:
+            del self.builds[build.pom_dir]
+
+    def kill_build(self, pom_dir):
+        build = self.builds.get(pom_dir)
+        if not build:
+            for pending in self.pending_builds:
+                if pending.pom_dir == pom_dir:
+                    build = pending
+        if not build and len(self.builds) == 1:
+            build = self.builds.values()[0]
+        if not build:
+            sublime.status_message('No Maven build running')
+            return
+        if build in self.pending_builds:
+            self.pending_builds.remove(build)
+        self.stop_build(build)
+        self.append_data(build, "[Cancelled]")
+        self.start_pending_builds()
+
+    def kill_all_builds(self):
+        for build in self.pending_builds + self.builds.values():
+            self.stop_build(build)
+            self.append_data(build, "[Cancelled]")
+        self.pending_builds = []
+
+    def get_panel_name(self, pom_dir):
+        if pom_dir not in self.panel_names:
+            panel_name = 'maven.' + os.path.basename(pom_dir)
+            taken = self.panel_names.values()
+            suffix = 1
+            while panel_name in taken:
+                suffix += 1
+                panel_name = 'maven.%s.%d' % (os.path.basename(pom_dir), suffix)
+            self.panel_names[pom_dir] = panel_name
+        return self.panel_names[pom_dir]
+
+    def prepare_output_panel(self, build):
+        # Try not to call get_output_panel until the regexes are assigned
+        build.output_view = self.window.get_output_panel(build.panel_name)
+
+        build.output_view.settings().set("result_file_regex", file_regex_pattern)
+        build.output_view.settings().set("result_base_dir", build.pom_dir)
+
+        # Call get_output_panel a second time after assigning the above
+        # settings, so that it'll be picked up as a result buffer
+        self.window.get_output_panel(build.panel_name)
 
-    def is_enabled(self, paths, goals, props = None, kill = False):
+    def is_enabled(self, paths, goals, props = None, kill = False, kill_all = False, incremental = False, backend = None):
+        if kill or kill_all:
+            return True
         if len(paths) == 0 and self.window.active_view().file_name():
             paths = [self.window.active_view().file_name()]
-        return ((len(paths) == 1) and (pom.find_nearest_pom(paths[0]) != None)) or kill
-
-    def append_data(self, proc, data):
-        if proc != self.proc:
-            # a second call to exec has been made before the first one
-            # finished, ignore it instead of intermingling the output.
-            if proc:
-                proc.kill()
-            return
+        return (len(paths) == 1) and (pom.find_nearest_pom(paths[0]) != None)
 
-        try:
-            str = data.decode("utf-8")
-        except:
-            str = "[Decode error - output not utf-8]"
-            proc = None
+    def find_build(self, proc):
+        for build in self.builds.values():
+            if build.proc == proc:
+                return build
+        return None
+
+    def append_data(self, build, data):
+        if isinstance(data, unicode):
+            str = data
+        else:
+            try:
+                str = data.decode("utf-8")
+            except:
+                str = "[Decode error - output not utf-8]"
 
         # Normalize newlines, Sublime Text always uses a single \n separator
         # in memory.
         str = str.replace('\r\n', '\n').replace('\r', '\n')
+        build.parser.feed(str)
+        if build.log:
+            build.log.write(str)
+
+        if build.max_lines and str.count('\n') > build.max_lines:
+            # all but the last max_lines lines would be trimmed right away
+            cut = len(str)
+            for idx in range(build.max_lines + 1):
+                cut = str.rindex('\n', 0, cut)
+            str = str[cut + 1:]
+
+        output_view = build.output_view
+        output_view.set_read_only(False)
+        edit = output_view.begin_edit()
+        output_view.insert(edit, output_view.size(), str)
+        if build.max_lines:
+            line_count = output_view.rowcol(output_view.size())[0] + 1
+            # trim in steps of a tenth of the limit rather than on every append
+            if line_count > build.max_lines + build.max_lines / 10:
+                output_view.erase(edit, sublime.Region(0, output_view.text_point(line_count - build.max_lines, 0)))
+        output_view.end_edit(edit)
+
+        output_view.set_read_only(True)
+
+        output_view.show(output_view.size())
+
+    def finish(self, build):
+        self.append_data(build, "[Finished]")
+        if build.log:
+            build.log.close()
+        if self.builds.get(build.pom_dir) == build:
+            del self.builds[build.pom_dir]
+
+        if build.incremental_planner and build.proc.returncode() == 0:
+            incremental.save_state(build.pom_dir, build.incremental_planner.goals, build.incremental_planner.fingerprints)
+        sublime.status_message(build.parser.close().summary())
+
+        history = get_build_history()
+        history.add(build.pom_dir, build.goals, build.proc.profiler.close())
+        history.save()
+
+        output_view = build.output_view
+        output_view.show(output_view.size())
+        # Set the selection to the start, so that next_result will work as expected
+        edit = output_view.begin_edit()
+        output_view.sel().clear()
+        output_view.sel().add(sublime.Region(0))
+        output_view.end_edit(edit)
 
-        # because for some reason on win boxes maven strips the drive letters from the path
-        # ... or maybe its just if you have cygwin installed...
-        # if os.name == "nt":
-        #     drive_letter = self.pomDir[0]
-        #     str = nt_bad_file_regex_pattern.sub(r'\1%s:\2\3' % drive_letter, str)
+        self.start_pending_builds()
 
-        self.output_view.set_read_only(False)
-        edit = self.output_view.begin_edit()
-        self.output_view.insert(edit, self.output_view.size(), str)
-        self.output_view.end_edit(edit)
+    '''
+    Reader threads only queue output, flush_output drains it on the UI thread
+    in bounded slices every output_flush_interval ms.
+    '''
+    def on_data(self, proc, data):
+        if self.get_output_buffer(proc).write(data):
+            sublime.set_timeout(functools.partial(self.flush_output, proc), output_flush_interval)
 
-        if os.name == 'nt':
-            bad_nt_path_region = self.output_view.find(nt_bad_file_regex_pattern, 0)
-            if bad_nt_path_region:
-                edit = self.output_view.begin_edit()
-                self.output_view.insert(edit, (bad_nt_path_region.begin() + 8), (self.pomDir[0] + ':'))
-                self.output_view.end_edit(edit)
+    def on_finished(self, proc):
+        if self.get_output_buffer(proc).close():
+            sublime.set_timeout(functools.partial(self.flush_output, proc), output_flush_interval)
+
+    def get_output_buffer(self, proc):
+        with self.output_buffers_lock:
+            if proc not in self.output_buffers:
+                self.output_buffers[proc] = output.OutputBuffer()
+            return self.output_buffers[proc]
+
+    def flush_output(self, proc):
+        output_buffer = self.get_output_buffer(proc)
+        build = self.find_build(proc)
+        if not build:
+            # output of a killed or superseded build
+            with self.output_buffers_lock:
+                del self.output_buffers[proc]
+            proc.kill()
+            return
 
-        self.output_view.set_read_only(True)
+        deadline = time.time() + output_flush_budget / 1000.0
+        while True:
+            data = output_buffer.drain(output_flush_max_bytes)
+            state = output_buffer.flush_done()
+            text = build.decoder.decode(data, state == output.OutputBuffer.FINISHED)
+            if text:
+                self.append_data(build, text)
+            if state != output.OutputBuffer.MORE or time.time() >= deadline:
+                break
+
+        if state == output.OutputBuffer.MORE:
+            sublime.set_timeout(functools.partial(self.flush_output, proc), output_flush_backlog_interval)
+        elif state == output.OutputBuffer.FINISHED:
+            with self.output_buffers_lock:
+                del self.output_buffers[proc]
+            self.finish(build)
 
-        self.output_view.show(self.output_view.size())
-        # sublime.set_timeout(lambda: self.delayed_output_follow, 10)
+    def get_current_java_class(self):
+        view = sublime.active_window().active_view()
+        cached = java_class_cache.get(view.id())
+        if cached and cached[0] == view.change_count():
+            return cached[1]
+
+        this_class = None
+        if view.file_name() and not view.is_dirty():
+            pom_dir = pom.find_nearest_pom(view.file_name())
+            if pom_dir:
+                class_index = javasrc.cached_class_index(pom_dir)
+                if class_index:
+                    this_class = class_index.class_of(view.file_name())
+                else:
+                    # scan the header this time, the index will be there for the next one
+                    javasrc.build_class_index_async(pom_dir)
+        if this_class is None:
+            this_class = javasrc.read_java_class(lambda length: view.substr(sublime.Region(0, length)), view.size())
+
+        java_class_cache[view.id()] = (view.change_count(), this_class)
+        return this_class
 
-    def delayed_output_follow():
-        self.output_view.show(self.output_view.size())
+'''
+Opens the next (forward) or previous compiler error of the window's latest build,
+straight from its BuildReport.
+'''
+class MavenNextErrorCommand(sublime_plugin.WindowCommand):
+    def run(self, forward = True):
+        report = build_reports.get(self.window.id())
+        error = None
+        if report:
+            error = report.next_error(forward)
+        if not error:
+            sublime.status_message('No Maven build errors')
+            return
+        self.window.open_file(error.location(), sublime.ENCODED_POSITION)
+        sublime.status_message('Maven error %d/%d: %s' % (report.error_cursor + 1, len(report.errors), error.message))
 
-    def print_last_str():
-        print self.last_str
+    def is_enabled(self, forward = True):
+        return self.window.id() in build_reports
 
-    def finish(self, proc):
-        self.append_data(proc, "[Finished]")
-        if proc != self.proc:
+'''
+Quick panel with the window's latest build summary: overall counts, module results,
+failing test classes and errors (selecting an error opens it).
+'''
+class MavenBuildSummaryCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        report = build_reports.get(self.window.id())
+        if not report:
             return
+        self.items = [[report.summary(), '']]
+        self.targets = [None]
+        for module in report.modules:
+            if module.status:
+                duration = ''
+                if module.duration != None:
+                    duration = ' (%.1f s)' % module.duration
+                self.items.append([module.name, '%s%s' % (module.status, duration)])
+                self.targets.append(None)
+        for test_class in report.test_classes:
+            if test_class[2] or test_class[3]:
+                self.items.append([test_class[0] or 'unknown test class',
+                    'Tests run: %d, Failures: %d, Errors: %d, Skipped: %d' % test_class[1:]])
+                self.targets.append(None)
+        for error in report.errors:
+            self.items.append([error.message, error.location()])
+            self.targets.append(error.location())
+        self.window.show_quick_panel(self.items, self.on_select)
+
+    def on_select(self, idx):
+        if idx >= 0 and self.targets[idx]:
+            self.window.open_file(self.targets[idx], sublime.ENCODED_POSITION)
+
+    def is_enabled(self):
+        return self.window.id() in build_reports
 
-        self.output_view.show(self.output_view.size())
-        # Set the selection to the start, so that next_result will work as expected
-        edit = self.output_view.begin_edit()
-        self.output_view.sel().clear()
-        self.output_view.sel().add(sublime.Region(0))
-        self.output_view.end_edit(edit)
+'''
+Quick panel with the slowest modules and mojos of the last maven_profile_builds (default 10)
+builds of the current pom directory, with their last and average durations.
+'''
+class MavenBuildProfileCommand(sublime_plugin.WindowCommand):
+    def run(self, paths = []):
+        if len(paths) == 0 and self.window.active_view() and self.window.active_view().file_name():
+            paths = [self.window.active_view().file_name()]
+        pom_dir = None
+        if len(paths) > 0:
+            pom_dir = pom.find_nearest_pom(paths[0])
+        last_n = get_setting('maven_profile_builds', 10)
+        modules, mojos = get_build_history().slowest(pom_dir, last_n)
+        if not modules and not mojos:
+            sublime.status_message('No Maven build profiles recorded for %s' % pom_dir)
+            return
 
-    def on_data(self, proc, data):
-        sublime.set_timeout(functools.partial(self.append_data, proc, data), 0)
+        items = []
+        for kind, ranked in (('module', modules), ('mojo', mojos)):
+            for name, last, average, builds in ranked[:20]:
+                trend = ''
+                if builds > 1 and average > 0:
+                    trend = ', last %+d%% vs avg' % int(round((last - average) * 100 / average))
+                items.append(['%s: %s' % (kind, name),
+                    'avg %.1f s over %d build(s), last %.1f s%s' % (average, builds, last, trend)])
+        self.window.show_quick_panel(items, None)
+
+def find_build_log(window):
+    view = window.active_view()
+    if view and view.file_name():
+        pom_dir = pom.find_nearest_pom(view.file_name())
+        if pom_dir and os.path.isfile(output.BuildLog.log_path(pom_dir, get_build_log_dir())):
+            return output.BuildLog.log_path(pom_dir, get_build_log_dir())
+    return build_logs.get(window.id())
 
-    def on_finished(self, proc):
-        sublime.set_timeout(functools.partial(self.finish, proc), 0)
+'''
+Opens the full log of the current project's (or the window's latest) build.
+'''
+class MavenOpenBuildLogCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        log_path = find_build_log(self.window)
+        if log_path:
+            self.window.open_file(log_path)
+        else:
+            sublime.status_message('No Maven build log found (see maven_output_max_lines)')
 
-    def get_current_java_class(self):
-        view = sublime.active_window().active_view()
-        data = view.substr(sublime.Region(0, view.size()))
+'''
+Searches the full build log for a regular expression without loading it into a view;
+matching lines are listed in a quick panel and open the log at that line.
+'''
+class MavenSearchBuildLogCommand(sublime_plugin.WindowCommand):
+    def run(self):
+        self.log_path = find_build_log(self.window)
+        if not self.log_path:
+            sublime.status_message('No Maven build log found (see maven_output_max_lines)')
+            return
+        self.window.show_input_panel('Search build log (regex)', '\\[ERROR\\]', self.on_done, None, None)
 
-        this_class = re.search("public[ \t]*class[ \t]*(\w+)", data)
+    def on_done(self, pattern):
+        thread.start_new_thread(self.search, (pattern,))
 
-        if this_class is not None:
-            this_class = this_class.group(1)
+    def search(self, pattern):
+        try:
+            matches = output.search_log(self.log_path, pattern)
+        except (IOError, re.error) as e:
+            sublime.set_timeout(functools.partial(sublime.status_message, 'Build log search failed: %s' % e), 0)
+            return
+        sublime.set_timeout(functools.partial(self.show_matches, matches), 0)
+
+    def show_matches(self, matches):
+        if not matches:
+            sublime.status_message('No match in %s' % self.log_path)
+            return
+        self.matches = matches
+        self.window.show_quick_panel([[line[:200], 'line %d' % line_number] for line_number, line in matches], self.on_select)
 
-            this_package = re.search("[ \t]*package (.*);", data)
-            if this_package is not None:
-                this_class = this_package.group(1)+"."+this_class
+    def on_select(self, idx):
+        if idx >= 0:
+            self.window.open_file('%s:%d' % (self.log_path, self.matches[idx][0]), sublime.ENCODED_POSITION)
 
-        return this_class
+'''
+Keeps pom.find_nearest_pom's cache and the Java class indexes honest when a
+pom.xml or a Java source is saved from the editor.
+'''
+class MavenPomCacheListener(sublime_plugin.EventListener):
+    def on_post_save(self, view):
+        if view.file_name() and os.path.basename(view.file_name()) == 'pom.xml':
+            pom.invalidate_pom_cache()
+        elif view.file_name() and view.file_name().endswith('.java'):
+            pom_dir = pom.find_nearest_pom(view.file_name())
+            if pom_dir:
+                javasrc.source_saved(view.file_name(), pom_dir)
+
+    def on_close(self, view):
+        java_class_cache.pop(view.id(), None)
+
+'''
+Continuous testing (maven_test_on_save): saving a Java file runs the tests of
+its class in the file's module.  Saves within maven_test_on_save_delay ms are
+collected into one run, and a run still going for the module is cancelled by
+the new one.
+'''
+class MavenTestOnSaveListener(sublime_plugin.EventListener):
+    # pom dir -> (generation, saved files), the generation being bumped by every save
+    pending = {}
+
+    def on_post_save(self, view):
+        file_name = view.file_name()
+        if not file_name or not file_name.endswith('.java') or not get_setting('maven_test_on_save', False):
+            return
+        pom_dir = pom.find_nearest_pom(file_name)
+        if not pom_dir:
+            return
+
+        generation, saved_files = self.pending.get(pom_dir, (0, set()))
+        saved_files.add(file_name)
+        self.pending[pom_dir] = (generation + 1, saved_files)
+        window = view.window() or sublime.active_window()
+        sublime.set_timeout(functools.partial(self.on_quiet, window, pom_dir, generation + 1),
+            get_setting('maven_test_on_save_delay', 500))
+
+    def on_quiet(self, window, pom_dir, generation):
+        if self.pending.get(pom_dir, (None,))[0] != generation:
+            # saved again since
+            return
+        saved_files = self.pending[pom_dir][1]
+        self.pending[pom_dir] = (generation, set())
+        # indexing the test sources walks the module, keep it off the UI thread
+        thread.start_new_thread(self.find_tests, (window, pom_dir, generation, sorted(saved_files)))
+
+    def find_tests(self, window, pom_dir, generation, saved_files):
+        test_classes = []
+        for saved_file in saved_files:
+            for test_class in testmap.find_test_classes(saved_file, pom_dir):
+                if test_class not in test_classes:
+                    test_classes.append(test_class)
+        sublime.set_timeout(functools.partial(self.run_tests, window, pom_dir, generation, test_classes), 0)
+
+    def run_tests(self, window, pom_dir, generation, test_classes):
+        if self.pending.get(pom_dir, (None,))[0] != generation:
+            return
+        if not test_classes:
+            sublime.status_message('No test found for the saved files')
+            return
+        args = {
+            'paths': [pom_dir],
+            'goals': ['test', '-DskipTests=false', '-Dtest=' + ','.join(test_classes),
+                '-DfailIfNoTests=false', '-Dsurefire.failIfNoSpecifiedTests=false']
+        }
+        backend = get_setting('maven_test_on_save_backend')
+        if backend:
+            args['backend'] = backend
+        window.run_command('maven', args)
+
+'''
+Keeps the background pom index (maven_pom_index) watching the folders open
+in any window.
+'''
+class MavenPomIndexListener(sublime_plugin.EventListener):
+    def on_activated(self, view):
+        global pom_watcher
+        if not get_setting('maven_pom_index', True):
+            return
+        folders = []
+        for window in sublime.windows():
+            folders.extend(window.folders())
+        if pom_watcher == None:
+            index = watcher.PomIndex(get_setting('maven_exclude_patterns'))
+            pom_watcher = watcher.PomWatcherThread(index, get_setting('maven_pom_index_poll_interval'))
+            pom_watcher.set_folders(folders)
+            if pom_watcher.can_watch():
+                pom_watcher.start()
+                pom.pom_index = index
+        else:
+            pom_watcher.set_folders(folders)
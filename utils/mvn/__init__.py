@@ -1 +1 @@
-__all__ = ['pom']
+__all__ = ['pom', 'classpath', 'output', 'resolver', 'incremental', 'profiler', 'testmap', 'javasrc', 'manifest', 'watcher']
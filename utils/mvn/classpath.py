@@ -0,0 +1,108 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os
+from utils.mvn import store
+
+# bumped whenever classpath resolution changes, so entries recorded by an
+# older version (1 for entries without one) are resolved again
+classpath_cache_version = 2
+
+'''
+ClasspathCache: persistent on-disk store of resolved module classpaths.
+Entries are keyed by module path and only served while the pom digest
+(see pom.pom_digest) they were recorded under still matches, and only if
+recorded with the current classpath_cache_version.
+'''
+class ClasspathCache(store.JsonStore):
+    description = 'classpath cache'
+
+    def get(self, pom_path, digest):
+        entry = store.JsonStore.get(self, pom_path)
+        if entry and entry.get('digest') == digest and entry.get('version', 1) == classpath_cache_version:
+            return entry.get('classpath')
+        return None
+
+    def put(self, pom_path, digest, module_classpath):
+        store.JsonStore.put(self, pom_path,
+            { 'digest': digest, 'classpath': list(module_classpath), 'version': classpath_cache_version })
+
+'''
+Identity of a jar laid out as in a Maven repository
+(.../artifactId/version/artifactId-version[-classifier].ext) regardless
+of its version: (artifact directory, classifier and extension), or None
+for anything else (class directories, system paths).
+'''
+def artifact_key(path):
+    version_dir, file_name = os.path.split(path)
+    artifact_dir, version = os.path.split(version_dir)
+    artifact_id = os.path.basename(artifact_dir)
+    prefix = '%s-%s' % (artifact_id, version)
+    if not artifact_id or not version or not file_name.startswith(prefix):
+        return None
+    return (artifact_dir, file_name[len(prefix):])
+
+'''
+MergedClasspath: the classpath of several modules merged into one list.
+Paths are normalized and interned, and kept in the order they were first
+added.  Of several versions of an artifact only the first one added is kept.
+Within a module Maven has already settled on one version, so across modules
+this is a heuristic: the version of the module added first (the generator
+adds them in project name order) wins, not a mediated one.
+'''
+class MergedClasspath(object):
+    def __init__(self):
+        self.entries = []
+        self.paths = {}
+        self.artifacts = {}
+        self.added = 0
+        self.added_size = 0
+        self.version_conflicts = 0
+
+    def add(self, path):
+        self.added += 1
+        self.added_size += len(path)
+        path = os.path.normpath(path)
+        if path in self.paths:
+            return
+        key = artifact_key(path)
+        if key != None:
+            if key in self.artifacts:
+                self.version_conflicts += 1
+                return
+            self.artifacts[key] = path
+        # one string per path, however many modules share it
+        self.paths[path] = path
+        self.entries.append(path)
+
+    def update(self, paths):
+        for path in paths:
+            self.add(path)
+
+    def size(self):
+        return sum([len(path) for path in self.entries])
+
+    def report(self):
+        return 'merged classpath: %d entries (%d chars) from %d (%d chars), %d duplicates and %d other versions dropped' % (
+            len(self.entries), self.size(), self.added, self.added_size,
+            self.added - len(self.entries) - self.version_conflicts, self.version_conflicts)
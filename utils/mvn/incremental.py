@@ -0,0 +1,164 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import sublime
+import os, json, hashlib, threading
+from utils.mvn import pom
+
+# per goal list, module fingerprints of the last successful build, relative to the reactor root
+state_file_name = os.path.join('target', 'sublime-maven-incremental.json')
+
+def update_file_fingerprint(digest, module_dir, file_path):
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return
+    digest.update('%s\0%r\0%d\n' % (pom.encode_path(os.path.relpath(file_path, module_dir)),
+        file_stat.st_mtime, file_stat.st_size))
+
+'''
+SHA-1 over (path, mtime, size) of the files a module's build reads: its
+pom.xml and, unless it is pom packaged, every file under src (skipping
+hidden directories and nested modules, fingerprinted on their own).
+READMEs, scripts or workspace files next to the pom do not count, so
+touching one in an aggregator does not rebuild every child.
+'''
+def module_fingerprint(module_dir, nested_module_dirs):
+    digest = hashlib.sha1()
+    pom_file = os.path.join(module_dir, 'pom.xml')
+    update_file_fingerprint(digest, module_dir, pom_file)
+    if pom.read_pom_model(pom_file).packaging == 'pom':
+        return digest.hexdigest()
+    for dirname, dirnames, filenames in os.walk(os.path.join(module_dir, 'src')):
+        dirnames[:] = sorted([name for name in dirnames if name[0] != '.'
+            and os.path.join(dirname, name) not in nested_module_dirs])
+        for filename in sorted(filenames):
+            update_file_fingerprint(digest, module_dir, os.path.join(dirname, filename))
+    return digest.hexdigest()
+
+'''
+Returns { module path relative to root_dir: fingerprint } for every module of the reactor at root_dir.
+'''
+def fingerprint_reactor(root_dir):
+    module_dirs = pom.find_reactor_modules(root_dir)
+    fingerprints = {}
+    for module_dir in module_dirs:
+        fingerprints[os.path.relpath(module_dir, root_dir)] = module_fingerprint(module_dir, module_dirs)
+    return fingerprints
+
+def read_state_file(root_dir):
+    state_file = os.path.join(root_dir, state_file_name)
+    if not os.path.isfile(state_file):
+        return {}
+    state_file_obj = open(state_file, 'r')
+    try:
+        states = json.load(state_file_obj)
+    except ValueError:
+        return {}
+    finally:
+        state_file_obj.close()
+    if not isinstance(states, dict):
+        return {}
+    return states
+
+def goals_key(goals):
+    return ' '.join(goals)
+
+'''
+Fingerprints recorded by the last successful build of goals, None if there was none:
+a 'compile' run says nothing about what an 'install' run would have to redo.
+'''
+def load_state(root_dir, goals):
+    state = read_state_file(root_dir).get(goals_key(goals))
+    if not isinstance(state, dict):
+        return None
+    return state
+
+def save_state(root_dir, goals, fingerprints):
+    states = read_state_file(root_dir)
+    states[goals_key(goals)] = fingerprints
+    state_file = os.path.join(root_dir, state_file_name)
+    if not os.path.isdir(os.path.dirname(state_file)):
+        os.makedirs(os.path.dirname(state_file))
+    state_file_obj = open(state_file, 'w')
+    json.dump(states, state_file_obj, indent = 1)
+    state_file_obj.close()
+
+'''
+Modules whose fingerprint differs from the recorded one, plus (transitively)
+the modules inheriting from a changed parent pom: -amd only covers modules
+depending on a changed one, not its children.
+'''
+def changed_modules(root_dir, fingerprints, state):
+    changed = set()
+    for module, fingerprint in fingerprints.items():
+        if state.get(module) != fingerprint:
+            changed.add(module)
+
+    parents = {}
+    for module in fingerprints:
+        parent_pom = pom.read_pom_model(os.path.join(root_dir, module, 'pom.xml')).relative_parent_pom()
+        if parent_pom:
+            parents[module] = os.path.relpath(os.path.dirname(parent_pom), root_dir)
+    grown = True
+    while grown:
+        grown = False
+        for module, parent in parents.items():
+            if parent in changed and module not in changed:
+                changed.add(module)
+                grown = True
+    return sorted(changed)
+
+'''
+Computes (off the UI thread) which modules of the reactor at root_dir changed
+since the last successful incremental build of the same goals, then calls
+on_planned(planner) through sublime.set_timeout.  After run():
+  fingerprints: current module fingerprints (save_state() them under goals once the build succeeded)
+  changed: changed module paths relative to root_dir
+  full_build: True if there is no usable previous state or every module changed
+'''
+class IncrementalBuildPlanner(threading.Thread):
+    def __init__(self, root_dir, goals, on_planned):
+        self.root_dir = root_dir
+        self.goals = goals
+        self.on_planned = on_planned
+        self.fingerprints = {}
+        self.changed = []
+        self.full_build = True
+        threading.Thread.__init__(self)
+
+    def run(self):
+        self.fingerprints = fingerprint_reactor(self.root_dir)
+        state = load_state(self.root_dir, self.goals)
+        if state != None:
+            self.changed = changed_modules(self.root_dir, self.fingerprints, state)
+            self.full_build = len(self.changed) == len(self.fingerprints)
+        sublime.set_timeout(lambda: self.on_planned(self), 0)
+
+    '''
+    Maven arguments restricting the build to the changed modules and their dependents.
+    '''
+    def project_list_args(self):
+        if self.full_build or not self.changed:
+            return []
+        return ['-pl', ','.join(self.changed), '-amd']
@@ -0,0 +1,187 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os, re, threading
+
+source_roots = [os.path.join('src', 'main', 'java'), os.path.join('src', 'test', 'java')]
+
+java_token_pattern = re.compile(r'//[^\n]*|/\*.*?\*/|/\*.*|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|@\s*interface\b|@\s*[\w$.]+|[\w$.]+|\S', re.S)
+type_keywords = set(['class', 'interface', 'enum', 'record'])
+
+class IncompleteHeader(Exception):
+    pass
+
+def header_tokens(text, complete):
+    for match in java_token_pattern.finditer(text):
+        if not complete and match.end() >= len(text):
+            # the token (or comment) may go on past the text
+            raise IncompleteHeader()
+        yield match
+    if not complete:
+        raise IncompleteHeader()
+
+'''
+Returns (package, top level type name) from the start of a Java source,
+skipping comments, imports, annotations (with their arguments) and
+modifiers, and stopping at the first type declaration.  Returns None when
+text ends before that declaration and complete is False (more text needed).
+'''
+def scan_java_header(text, complete = True):
+    try:
+        return scan_tokens(text, complete)
+    except IncompleteHeader:
+        return None
+
+def scan_tokens(text, complete):
+    package = None
+    tokens = header_tokens(text, complete)
+    for match in tokens:
+        token = match.group()
+        if token.startswith('//') or token.startswith('/*'):
+            continue
+        if token == 'package' or token == 'import':
+            statement = []
+            for match in tokens:
+                if match.group() == ';':
+                    break
+                if not match.group().startswith('/'):
+                    statement.append(match.group())
+            else:
+                break
+            if token == 'package':
+                package = ''.join(statement)
+        elif token[0] == '@' and token.replace(' ', '') != '@interface':
+            # annotation: skip its (possibly nested) arguments
+            end = match.end()
+            while end < len(text) and text[end].isspace():
+                end += 1
+            if end == len(text) and not complete:
+                raise IncompleteHeader()
+            if end < len(text) and text[end] == '(':
+                depth = 0
+                for match in tokens:
+                    if match.group() == '(':
+                        depth += 1
+                    elif match.group() == ')':
+                        depth -= 1
+                        if depth == 0:
+                            break
+                else:
+                    break
+        elif token in type_keywords or token[0] == '@':
+            for match in tokens:
+                if not match.group().startswith('/'):
+                    return (package, match.group())
+            break
+    return (package, None)
+
+'''
+Fully qualified name of the top level type of a Java source, reading as
+little of it as possible: read(length) returns its first length characters.
+'''
+def read_java_class(read, size, chunk_size = 4096):
+    length = chunk_size
+    while True:
+        header = scan_java_header(read(length), length >= size)
+        if header != None:
+            break
+        length *= 2
+    package, type_name = header
+    if type_name and package:
+        return package + '.' + type_name
+    return type_name
+
+'''
+Index of the Java sources of one module: file -> fully qualified class name,
+with packages taken from the directory layout under the source roots.
+'''
+class JavaClassIndex(object):
+    def __init__(self, module_dir):
+        self.module_dir = module_dir
+        self.classes = {}
+        for source_root in source_roots:
+            root_dir = os.path.join(module_dir, source_root)
+            for dirname, dirnames, filenames in os.walk(root_dir):
+                dirnames[:] = [name for name in dirnames if name[0] != '.']
+                package = os.path.relpath(dirname, root_dir).replace(os.sep, '.')
+                for filename in filenames:
+                    class_name, ext = os.path.splitext(filename)
+                    if ext != '.java' or class_name in ['package-info', 'module-info']:
+                        continue
+                    if package != '.':
+                        class_name = package + '.' + class_name
+                    self.classes[os.path.join(dirname, filename)] = class_name
+
+    def class_of(self, source_file):
+        return self.classes.get(source_file)
+
+# module dir -> JavaClassIndex
+class_index_cache = {}
+class_index_cache_lock = threading.Lock()
+# module dirs whose index build_class_index_async() is building
+class_index_pending = set()
+
+def get_class_index(module_dir):
+    with class_index_cache_lock:
+        index = class_index_cache.get(module_dir)
+    if index == None:
+        index = JavaClassIndex(module_dir)
+        with class_index_cache_lock:
+            class_index_cache[module_dir] = index
+    return index
+
+'''
+Builds the index of module_dir on a background thread, unless it is built
+or being built already.
+'''
+def build_class_index_async(module_dir):
+    with class_index_cache_lock:
+        if module_dir in class_index_cache or module_dir in class_index_pending:
+            return
+        class_index_pending.add(module_dir)
+    builder = threading.Thread(target = build_class_index, args = (module_dir,))
+    builder.daemon = True
+    builder.start()
+
+def build_class_index(module_dir):
+    try:
+        get_class_index(module_dir)
+    finally:
+        with class_index_cache_lock:
+            class_index_pending.discard(module_dir)
+
+'''
+The index of module_dir if it has been built already, None otherwise.
+'''
+def cached_class_index(module_dir):
+    with class_index_cache_lock:
+        return class_index_cache.get(module_dir)
+
+'''
+Drops the index of module_dir when a source it does not know of has been saved.
+'''
+def source_saved(source_file, module_dir):
+    index = cached_class_index(module_dir)
+    if index and index.class_of(source_file) == None:
+        with class_index_cache_lock:
+            class_index_cache.pop(module_dir, None)
@@ -0,0 +1,47 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+from utils.mvn import store
+
+'''
+ProjectManifest: persistent record of generated projects, keyed by the path
+they were generated from.  Per module path it keeps the pom digest (see
+pom.pom_digest) along with the project name and classpath generated from it,
+so regenerating only has to redo modules whose digest changed.  A record is
+only served for the generation options it was made with.
+'''
+class ProjectManifest(store.JsonStore):
+    description = 'project manifest'
+
+    '''
+    Returns { module path: { 'digest', 'name', 'classpath' } } as recorded for
+    target_path with the same options, {} otherwise.
+    '''
+    def get(self, target_path, options):
+        entry = store.JsonStore.get(self, target_path)
+        if entry and entry.get('options') == options:
+            return entry.get('modules', {})
+        return {}
+
+    def put(self, target_path, options, modules):
+        store.JsonStore.put(self, target_path, { 'options': options, 'modules': modules })
@@ -0,0 +1,389 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os, threading, codecs, re, hashlib
+from collections import deque
+
+'''
+OutputBuffer: lock-protected FIFO of raw process output.
+Reader threads write() into it, the UI thread drains it in bounded slices
+on a fixed interval, so UI work per flush does not depend on how fast the
+process writes.
+'''
+class OutputBuffer(object):
+    # flush_done() results
+    IDLE = 0
+    MORE = 1
+    FINISHED = 2
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chunks = deque()
+        self.size = 0
+        self.closed = False
+        self.flush_pending = False
+        self.finish_reported = False
+
+    '''
+    Queues data.  Returns True if the caller must schedule a flush
+    (no flush was pending yet).
+    '''
+    def write(self, data):
+        with self.lock:
+            self.chunks.append(data)
+            self.size += len(data)
+            return self.claim_flush()
+
+    '''
+    Marks the end of output.  Returns True if the caller must schedule a flush.
+    '''
+    def close(self):
+        with self.lock:
+            self.closed = True
+            return self.claim_flush()
+
+    def claim_flush(self):
+        if self.flush_pending:
+            return False
+        self.flush_pending = True
+        return True
+
+    '''
+    Removes and returns up to max_bytes of queued output.
+    '''
+    def drain(self, max_bytes):
+        pieces = []
+        with self.lock:
+            remaining = max_bytes
+            while self.chunks and remaining > 0:
+                chunk = self.chunks.popleft()
+                if len(chunk) > remaining:
+                    self.chunks.appendleft(chunk[remaining:])
+                    chunk = chunk[:remaining]
+                pieces.append(chunk)
+                remaining -= len(chunk)
+            self.size -= max_bytes - remaining
+        return ''.join(pieces)
+
+    '''
+    Called after each flush: MORE if output is still queued (flush again),
+    FINISHED exactly once after close() when everything has been drained,
+    IDLE otherwise (the next write() schedules a new flush).
+    '''
+    def flush_done(self):
+        with self.lock:
+            if self.size > 0:
+                return OutputBuffer.MORE
+            self.flush_pending = False
+            if self.closed and not self.finish_reported:
+                self.finish_reported = True
+                return OutputBuffer.FINISHED
+            return OutputBuffer.IDLE
+
+    def pending(self):
+        with self.lock:
+            return self.size
+
+
+# [ERROR] line naming a java file WITHOUT drive letter
+# (on win boxes maven strips the drive letters from the path... or maybe its just if you have cygwin installed)
+nt_bad_file_pattern = re.compile(ur'^(\[ERROR\] )([^:\n]+\.java)', re.M)
+error_line_prefix = u'[ERROR] '
+
+'''
+OutputDecoder: incremental utf-8 decoding with newline normalization
+(Sublime Text always uses a single \n separator in memory).
+Multi-byte characters and \r\n pairs split across chunks are handled.
+If drive_letter is given, every [ERROR] line whose java file path lacks a
+drive letter gets it prepended; a trailing partial line that may be such
+an [ERROR] line is held back until it is complete.
+'''
+class OutputDecoder(object):
+    def __init__(self, encoding = 'utf-8', drive_letter = None):
+        self.decoder = codecs.getincrementaldecoder(encoding)('replace')
+        self.pending_cr = False
+        self.drive_letter = drive_letter
+        self.partial_line = u''
+
+    def decode(self, data, final = False):
+        text = self.decoder.decode(data, final)
+        if self.pending_cr:
+            text = u'\r' + text
+            self.pending_cr = False
+        if not final and text.endswith(u'\r'):
+            text = text[:-1]
+            self.pending_cr = True
+        text = text.replace(u'\r\n', u'\n').replace(u'\r', u'\n')
+        if self.drive_letter:
+            text = self.fix_drive_letters(text, final)
+        return text
+
+    def fix_drive_letters(self, text, final = False):
+        text = self.partial_line + text
+        self.partial_line = u''
+        if not final:
+            last_line = text[text.rfind(u'\n') + 1:]
+            if last_line and (error_line_prefix.startswith(last_line) or last_line.startswith(error_line_prefix)):
+                self.partial_line = last_line
+                text = text[:len(text) - len(last_line)]
+        return nt_bad_file_pattern.sub(ur'\1%s:\2' % self.drive_letter, text)
+
+
+compiler_message_pattern = re.compile(ur'^\[(ERROR|WARNING)\] ([A-Z]?[:]?[^\[]+):\[([0-9]+),([0-9]+)\] ?(.*)$')
+tests_run_pattern = re.compile(ur'Tests run: ([0-9]+), Failures: ([0-9]+), Errors: ([0-9]+), Skipped: ([0-9]+)(.*)$')
+test_class_pattern = re.compile(ur' - in (\S+)')
+# module start, not 'Building jar: <file>' (war:, ear:, ...) of the packaging plugins;
+# shared with profiler.BuildProfiler
+building_module_pattern = re.compile(ur'^\[INFO\] Building (?!\w+: )(.+?)(?: +\[[0-9]+/[0-9]+\])?\s*$')
+reactor_summary_pattern = re.compile(ur'^\[INFO\] Reactor Summary')
+reactor_module_pattern = re.compile(ur'^\[INFO\] (.+?) \.+ ?(SUCCESS|FAILURE|SKIPPED)(?: \[ *([0-9.:]+) *(min|s|ms)?\])?')
+build_result_pattern = re.compile(ur'^\[INFO\] BUILD (SUCCESS|FAILURE)')
+total_time_pattern = re.compile(ur'^\[INFO\] Total time: *(.+)$')
+
+'''
+Seconds from a Maven duration ('1.234 s', '01:02 min', '12 ms', '2.1s').
+'''
+def parse_duration(value, unit = None):
+    if value == None:
+        return None
+    seconds = 0.0
+    for part in value.split(':'):
+        seconds = seconds * 60 + float(part or 0)
+    if unit == 'ms':
+        seconds /= 1000
+    elif unit == 'min' and ':' not in value:
+        seconds *= 60
+    return seconds
+
+class BuildDiagnostic(object):
+    def __init__(self, severity, file_name, line, column, message, output_line):
+        self.severity = severity
+        self.file_name = file_name
+        self.line = line
+        self.column = column
+        self.message = message
+        # 0 based line of the output panel this diagnostic was printed on
+        self.output_line = output_line
+
+    def location(self):
+        return '%s:%d:%d' % (self.file_name, self.line, self.column)
+
+class ModuleResult(object):
+    def __init__(self, name, status = None, duration = None):
+        self.name = name
+        self.status = status
+        self.duration = duration
+
+'''
+BuildReport: indexed model of one build's output, filled by MavenOutputParser.
+Counts, the n-th error and the summary are direct lookups, nothing is
+rescanned from the output text.
+'''
+class BuildReport(object):
+    def __init__(self):
+        self.errors = []
+        self.warnings = []
+        # (test class or None, run, failures, errors, skipped) per 'Tests run:' line of a test class
+        self.test_classes = []
+        self.tests = { 'run': 0, 'failures': 0, 'errors': 0, 'skipped': 0 }
+        # modules in build order, reactor summary results merged in
+        self.modules = []
+        self.modules_by_name = {}
+        self.result = None
+        self.total_time = None
+        self.line_count = 0
+        self.error_cursor = -1
+
+    def module(self, name):
+        if name not in self.modules_by_name:
+            self.modules_by_name[name] = ModuleResult(name)
+            self.modules.append(self.modules_by_name[name])
+        return self.modules_by_name[name]
+
+    '''
+    Steps the error cursor forward (or backward) and returns that error, None without errors.
+    '''
+    def next_error(self, forward = True):
+        if not self.errors:
+            return None
+        step = 1
+        if not forward:
+            step = -1
+        self.error_cursor = (self.error_cursor + step) % len(self.errors)
+        return self.errors[self.error_cursor]
+
+    def failed_tests(self):
+        return self.tests['failures'] + self.tests['errors']
+
+    def summary(self):
+        summary = '%d error(s), %d warning(s)' % (len(self.errors), len(self.warnings))
+        if self.tests['run']:
+            summary += ', tests run: %d, failures: %d, errors: %d, skipped: %d' % (self.tests['run'],
+                self.tests['failures'], self.tests['errors'], self.tests['skipped'])
+        if self.result:
+            summary = 'BUILD %s: %s' % (self.result, summary)
+        if self.total_time:
+            summary += ' (%s)' % self.total_time
+        return summary
+
+'''
+MavenOutputParser: line oriented, streaming classifier of (decoded, newline
+normalized) Maven output into a BuildReport.  feed() takes arbitrary slices,
+incomplete trailing lines are kept until their newline arrives.
+'''
+class MavenOutputParser(object):
+    def __init__(self, report = None):
+        self.report = report or BuildReport()
+        self.partial_line = u''
+        self.current_module = None
+        self.in_reactor_summary = False
+
+    def feed(self, text):
+        lines = (self.partial_line + text).split(u'\n')
+        self.partial_line = lines.pop()
+        for line in lines:
+            self.parse_line(line)
+            self.report.line_count += 1
+
+    def close(self):
+        if self.partial_line:
+            self.parse_line(self.partial_line)
+            self.partial_line = u''
+        return self.report
+
+    def parse_line(self, line):
+        report = self.report
+        if not line.startswith(u'[') and u'Tests run:' not in line:
+            return
+
+        match = compiler_message_pattern.match(line)
+        if match:
+            diagnostic = BuildDiagnostic(match.group(1), match.group(2).strip(), int(match.group(3)),
+                int(match.group(4)), match.group(5), report.line_count)
+            if match.group(1) == 'ERROR':
+                report.errors.append(diagnostic)
+            else:
+                report.warnings.append(diagnostic)
+            return
+
+        match = tests_run_pattern.search(line)
+        if match:
+            counts = [int(count) for count in match.groups()[:4]]
+            if u'Time elapsed' in match.group(5):
+                test_class = test_class_pattern.search(match.group(5))
+                if test_class:
+                    test_class = test_class.group(1)
+                report.test_classes.append(tuple([test_class] + counts))
+            else:
+                # per module totals (no 'Time elapsed')
+                for key, count in zip(('run', 'failures', 'errors', 'skipped'), counts):
+                    report.tests[key] += count
+            return
+
+        if reactor_summary_pattern.match(line):
+            self.in_reactor_summary = True
+            return
+
+        if self.in_reactor_summary:
+            match = reactor_module_pattern.match(line)
+            if match:
+                module = report.module(match.group(1).strip())
+                module.status = match.group(2)
+                module.duration = parse_duration(match.group(3), match.group(4))
+                return
+
+        match = build_result_pattern.match(line)
+        if match:
+            report.result = match.group(1)
+            self.in_reactor_summary = False
+            return
+
+        match = total_time_pattern.match(line)
+        if match:
+            report.total_time = match.group(1).strip()
+            return
+
+        match = building_module_pattern.match(line)
+        if match and not self.in_reactor_summary:
+            # 'Building <name> <version>', the reactor summary only shows the name
+            self.current_module = report.module(match.group(1).strip().rsplit(u' ', 1)[0])
+
+
+'''
+BuildLog: full build output of a pom directory streamed to a file of its own
+in log_dir (outside of the project, where 'mvn clean' cannot delete it).
+Opening a new log rotates the previous ones (.1, .2, ...).
+'''
+class BuildLog(object):
+    def __init__(self, pom_dir, log_dir, backups = 2):
+        self.path = BuildLog.log_path(pom_dir, log_dir)
+        if not os.path.isdir(log_dir):
+            os.makedirs(log_dir)
+        for idx in range(backups, 0, -1):
+            older = '%s.%d' % (self.path, idx)
+            newer = self.path
+            if idx > 1:
+                newer = '%s.%d' % (self.path, idx - 1)
+            if os.path.isfile(newer):
+                if os.path.isfile(older):
+                    os.remove(older)
+                os.rename(newer, older)
+        self.log_file = open(self.path, 'wb')
+
+    @staticmethod
+    def log_path(pom_dir, log_dir):
+        pom_dir = os.path.normpath(os.path.abspath(pom_dir))
+        if isinstance(pom_dir, unicode):
+            pom_dir = pom_dir.encode('utf-8')
+        return os.path.join(log_dir, '%s-%s.log' % (os.path.basename(pom_dir) or 'root',
+            hashlib.sha1(pom_dir).hexdigest()[:12]))
+
+    def write(self, text):
+        if self.log_file:
+            self.log_file.write(text.encode('utf-8'))
+
+    def close(self):
+        if self.log_file:
+            self.log_file.close()
+            self.log_file = None
+
+'''
+Streams through a (possibly huge) log file and returns up to max_matches
+(line number, line) pairs for lines matching the regular expression pattern.
+'''
+def search_log(path, pattern, max_matches = 1000):
+    matcher = re.compile(pattern)
+    matches = []
+    log_file = open(path, 'rb')
+    try:
+        line_number = 0
+        for line in log_file:
+            line_number += 1
+            line = line.decode('utf-8', 'replace').rstrip(u'\r\n')
+            if matcher.search(line):
+                matches.append((line_number, line))
+                if len(matches) >= max_matches:
+                    break
+    finally:
+        log_file.close()
+    return matches
@@ -21,7 +21,7 @@
 #   THE SOFTWARE.
 
 import sublime
-import os, json, threading, string, subprocess, re, sys
+import os, json, threading, string, subprocess, re, sys, hashlib, time, Queue, multiprocessing, stat, fnmatch
 from StringIO import StringIO
 
 __file__ = os.path.normpath(os.path.abspath(__file__))
@@ -31,32 +31,92 @@ if libs_path not in sys.path:
 
 from xml.etree import ElementTree
 from elementtree import SimpleXMLTreeBuilder
+import xmllib
 
 ElementTree.XMLTreeBuilder = SimpleXMLTreeBuilder.TreeBuilder
 
+# expat is not shipped with every Sublime Text build, xmllib is the fallback
+try:
+    from xml.parsers import expat
+    has_expat = True
+except ImportError:
+    has_expat = False
+
+from utils.mvn import classpath
+
 non_cp_mvn_output_pattern = re.compile('^\[[A-Z]+\] ')
 namespace_tagname_pattern = re.compile('^\{.+\}([a-zA-Z0-9\-\_\.]+)$')
 
+# process-wide memo of path -> (nearest pom root, expiry time), cleared by
+# invalidate_pom_cache() when a pom.xml is saved
+nearest_pom_cache = {}
+nearest_pom_cache_lock = threading.Lock()
+
+# seconds a 'no pom found' entry (pom root None) is trusted: a pom.xml created
+# outside the editor (archetype:generate, a checkout) never invalidates the cache
+negative_pom_cache_ttl = 5
+
+# live watcher.PomIndex of the open folders, if one is running; kept across reloads
+try:
+    pom_index
+except NameError:
+    pom_index = None
+
+def invalidate_pom_cache():
+    with nearest_pom_cache_lock:
+        nearest_pom_cache.clear()
+
 '''
-Recursive call to find (and return) the nearest path in the current
-tree (searching up the path tree) to a pom.xml file.
+Find (and return) the nearest path in the current tree (searching up
+the path tree) to a pom.xml file.
 Returns None if we hit the root without hitting a pom.xml file.
+Results are memoized for every directory visited on the way up; cached
+pom roots are checked to still hold a pom.xml before being returned, and
+'no pom found' results expire after negative_pom_cache_ttl seconds.
+Paths covered by pom_index are answered from it without touching the disk.
 '''
 def find_nearest_pom(path):
+    if pom_index != None:
+        covered, pom_root = pom_index.nearest(path)
+        if covered:
+            return pom_root
+    visited = [path]
     cur_path = None
-    if os.path.isdir(path):
+    if path in nearest_pom_cache:
+        cur_path = path
+    elif os.path.isdir(path):
         cur_path = path
     else:
         cur_path = os.path.dirname(path)
 
-    if os.path.isfile(os.path.join(cur_path, 'pom.xml')):
-        return cur_path
-    else:
+    now = time.time()
+    expires = None
+    while True:
+        with nearest_pom_cache_lock:
+            cached = nearest_pom_cache.get(cur_path)
+        if cached != None and (cached[1] == None or cached[1] > now):
+            pom_root, expires = cached
+            if pom_root != None and not os.path.isfile(os.path.join(pom_root, 'pom.xml')):
+                # pom.xml removed behind our back
+                invalidate_pom_cache()
+                return find_nearest_pom(path)
+            break
+
+        visited.append(cur_path)
+        if os.path.isfile(os.path.join(cur_path, 'pom.xml')):
+            pom_root = cur_path
+            break
         parent,child = os.path.split(cur_path)
         if len(child) == 0:
-            return None
-        else:
-            return find_nearest_pom(parent)
+            pom_root = None
+            expires = now + negative_pom_cache_ttl
+            break
+        cur_path = parent
+
+    with nearest_pom_cache_lock:
+        for visited_path in visited:
+            nearest_pom_cache[visited_path] = (pom_root, expires)
+    return pom_root
 
 class PomHandler(object):
 
@@ -64,6 +124,7 @@ class PomHandler(object):
         self.elementsQueue = []
         self.groupId = None
         self.artifactId = None
+        self.hasParent = False
 
     # a little messy but does the job since xml.sax isnt really an option
     def parse(self, pom_file):
@@ -77,6 +138,7 @@ class PomHandler(object):
                 elif tag_name == 'artifactId':
                     self.artifactId = node.text
                 elif tag_name == 'parent':
+                    self.hasParent = True
                     # get the parent groupId, default for child if child doesnt have groupId set
                     for child in node:
                         tag_name_match = namespace_tagname_pattern.match(child.tag)
@@ -86,6 +148,30 @@ class PomHandler(object):
                                 if self.groupId == None:
                                     self.groupId = child.text
 
+    '''
+    Streaming variant of parse() reading only the top level coordinates
+    (groupId, artifactId and the parent groupId fallback).  Parsing stops as
+    soon as both groupId and artifactId are known and no element tree is built,
+    so <dependencies>, <build> etc. are never materialized.
+    '''
+    def parse_header(self, pom_file):
+        header_reader = PomHeaderReader(self)
+        pom_file_obj = open(pom_file, 'rb')
+        try:
+            feed, close = pom_event_parser(header_reader)
+            while True:
+                data = pom_file_obj.read(8192)
+                if not data:
+                    break
+                feed(data)
+            close()
+        except PomHeaderComplete:
+            pass
+        finally:
+            pom_file_obj.close()
+        if self.groupId == None:
+            self.groupId = header_reader.parent_group_id
+
     def get_project_name(self, long_name = False):
         if not long_name:
             groupid_bits = self.groupId.split('.')
@@ -96,33 +182,641 @@ class PomHandler(object):
         return '%s:%s:PROJECT' % (self.groupId, self.artifactId)
 
 
+class PomHeaderComplete(Exception):
+    pass
+
+'''
+Event sink for PomHandler.parse_header(): tracks the element path and
+records the top level coordinates, raising PomHeaderComplete once groupId
+and artifactId are both known.
+'''
+class PomHeaderReader(object):
+    def __init__(self, pom_handler):
+        self.pom_handler = pom_handler
+        self.parent_group_id = None
+        self.path = []
+        self.text = []
+
+    def start(self, tag):
+        self.path.append(tag[tag.rfind('}') + 1:])
+        del self.text[:]
+
+    def data(self, data):
+        # only top level and <parent> children carry interesting text
+        if len(self.path) <= 3:
+            self.text.append(data)
+
+    def end(self, tag):
+        depth = len(self.path)
+        tag_name = self.path.pop()
+        if depth == 2:
+            if tag_name == 'groupId':
+                self.pom_handler.groupId = ''.join(self.text).strip()
+            elif tag_name == 'artifactId':
+                self.pom_handler.artifactId = ''.join(self.text).strip()
+            elif tag_name == 'parent':
+                self.pom_handler.hasParent = True
+        elif depth == 3 and self.path[1] == 'parent' and tag_name == 'groupId':
+            self.parent_group_id = ''.join(self.text).strip()
+        del self.text[:]
+        if self.pom_handler.groupId and self.pom_handler.artifactId:
+            raise PomHeaderComplete()
+
+'''
+Event sink for update_pom_digest(): records the <parent><relativePath> of
+a pom, raising PomHeaderComplete once <parent> has been read.
+'''
+class PomParentReader(object):
+    def __init__(self):
+        self.has_parent = False
+        # None: default ../pom.xml, '': lookup disabled
+        self.relative_path = None
+        self.path = []
+        self.text = []
+
+    def start(self, tag):
+        self.path.append(tag[tag.rfind('}') + 1:])
+        del self.text[:]
+
+    def data(self, data):
+        if len(self.path) == 3:
+            self.text.append(data)
+
+    def end(self, tag):
+        depth = len(self.path)
+        tag_name = self.path.pop()
+        if depth == 3 and self.path[1] == 'parent' and tag_name == 'relativePath':
+            self.relative_path = ''.join(self.text).strip()
+        elif depth == 2 and tag_name == 'parent':
+            self.has_parent = True
+            raise PomHeaderComplete()
+        del self.text[:]
+
+'''
+Returns (feed, close) of a streaming parser calling reader.start(tag),
+reader.data(data) and reader.end(tag): expat when available, xmllib otherwise.
+'''
+def pom_event_parser(reader):
+    if has_expat:
+        # same namespace separator as the bundled XMLTreeBuilder, so tags read '{ns}name'
+        parser = expat.ParserCreate(None, '}')
+        parser.StartElementHandler = lambda tag, attrs: reader.start(tag)
+        parser.EndElementHandler = reader.end
+        parser.CharacterDataHandler = reader.data
+        return parser.Parse, lambda: parser.Parse('', True)
+    parser = PomHeaderParser(reader)
+    return parser.feed, parser.close
+
+'''
+xmllib based event source for PomHeaderReader and PomParentReader, used when
+expat is not available.
+'''
+class PomHeaderParser(xmllib.XMLParser):
+    def __init__(self, header_reader):
+        self.header_reader = header_reader
+        xmllib.XMLParser.__init__(self)
+
+    def handle_data(self, data):
+        self.header_reader.data(data)
+
+    handle_cdata = handle_data
+
+    def unknown_starttag(self, tag, attrs):
+        self.header_reader.start(SimpleXMLTreeBuilder.fixname(tag))
+
+    def unknown_endtag(self, tag):
+        self.header_reader.end(SimpleXMLTreeBuilder.fixname(tag))
+
+'''
+Small thread-safe LRU mapping, used to memoize parsed pom models.
+'''
+class LruCache(object):
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = {}
+        self.tick = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry == None:
+                return None
+            self.tick += 1
+            entry[0] = self.tick
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            self.tick += 1
+            self.entries[key] = [self.tick, value]
+            if len(self.entries) > self.max_size:
+                # evict the least recently used half in one pass
+                by_age = sorted(self.entries.items(), key = lambda item: item[1][0])
+                for old_key, old_entry in by_age[:len(by_age) / 2]:
+                    del self.entries[old_key]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+def local_tag_name(node):
+    return node.tag[node.tag.rfind('}') + 1:]
+
+def child_text(node, tag_name, default = None):
+    for child in node:
+        if local_tag_name(child) == tag_name:
+            return (child.text or '').strip()
+    return default
+
+property_reference_pattern = re.compile(r'\$\{([^}]+)\}')
+
+'''
+A <dependency> of a pom, or an entry of its <dependencyManagement>.
+'''
+class PomDependency(object):
+    def __init__(self):
+        self.groupId = None
+        self.artifactId = None
+        self.version = None
+        self.type = None
+        self.classifier = None
+        self.scope = None
+        self.systemPath = None
+        self.optional = False
+        self.exclusions = []
+
+    def parse(self, node):
+        self.groupId = child_text(node, 'groupId')
+        self.artifactId = child_text(node, 'artifactId')
+        self.version = child_text(node, 'version')
+        self.type = child_text(node, 'type')
+        self.classifier = child_text(node, 'classifier')
+        self.scope = child_text(node, 'scope')
+        self.systemPath = child_text(node, 'systemPath')
+        self.optional = child_text(node, 'optional') == 'true'
+        for child in node:
+            if local_tag_name(child) == 'exclusions':
+                for exclusion in child:
+                    if local_tag_name(exclusion) == 'exclusion':
+                        self.exclusions.append((child_text(exclusion, 'groupId'), child_text(exclusion, 'artifactId')))
+        return self
+
+    '''
+    Key under which dependencies override each other and dependencyManagement applies.
+    '''
+    def management_key(self):
+        return (self.groupId, self.artifactId, self.type or 'jar', self.classifier)
+
+    def copy(self, interpolate = None):
+        dependency = PomDependency()
+        for attr in ('groupId', 'artifactId', 'version', 'type', 'classifier', 'scope', 'systemPath'):
+            value = getattr(self, attr)
+            if interpolate and value:
+                value = interpolate(value)
+            setattr(dependency, attr, value)
+        dependency.optional = self.optional
+        dependency.exclusions = self.exclusions[:]
+        return dependency
+
+    def __repr__(self):
+        return '%s:%s:%s:%s' % (self.groupId, self.artifactId, self.type or 'jar', self.version)
+
+'''
+PomModel: the content of one pom.xml (coordinates, packaging, modules, properties,
+dependencyManagement and dependencies).  Models returned by read_pom_model() are
+the raw file content, load_pom_model() returns the effective model with the
+<parent> chain inherited and ${...} properties interpolated.
+Models are shared through the cache, callers must not modify them.
+'''
+class PomModel(object):
+    def __init__(self, pom_file = None):
+        self.pom_file = pom_file
+        self.groupId = None
+        self.artifactId = None
+        self.version = None
+        self.packaging = None
+        self.parent = None
+        self.modules = []
+        self.properties = {}
+        self.dependency_management = []
+        self.dependencies = []
+        # a <profile> adds dependencies, dependencyManagement or properties
+        # (profiles are not evaluated, see resolver.LocalRepositoryResolver)
+        self.has_profile_dependencies = False
+
+    def parse(self, pom_file):
+        self.pom_file = pom_file
+        root = ElementTree.parse(pom_file).getroot()
+        for node in root:
+            tag_name = local_tag_name(node)
+            if tag_name in ('groupId', 'artifactId', 'version', 'packaging'):
+                setattr(self, tag_name, (node.text or '').strip())
+            elif tag_name == 'parent':
+                self.parent = {
+                    'groupId': child_text(node, 'groupId'),
+                    'artifactId': child_text(node, 'artifactId'),
+                    'version': child_text(node, 'version'),
+                    # None: default ../pom.xml, '': lookup disabled
+                    'relativePath': child_text(node, 'relativePath')
+                }
+            elif tag_name == 'modules':
+                for child in node:
+                    if local_tag_name(child) == 'module' and child.text:
+                        self.modules.append(child.text.strip())
+            elif tag_name == 'properties':
+                for child in node:
+                    if isinstance(child.tag, basestring):
+                        self.properties[local_tag_name(child)] = (child.text or '').strip()
+            elif tag_name == 'dependencyManagement':
+                for child in node:
+                    if local_tag_name(child) == 'dependencies':
+                        self.dependency_management = self.parse_dependencies(child)
+            elif tag_name == 'dependencies':
+                self.dependencies = self.parse_dependencies(node)
+            elif tag_name == 'profiles':
+                for profile in node:
+                    for child in profile:
+                        if local_tag_name(child) in ('dependencies', 'dependencyManagement', 'properties'):
+                            self.has_profile_dependencies = True
+        return self
+
+    def parse_dependencies(self, node):
+        dependencies = []
+        for child in node:
+            if local_tag_name(child) == 'dependency':
+                dependencies.append(PomDependency().parse(child))
+        return dependencies
+
+    def coordinates(self):
+        return (self.groupId, self.artifactId, self.version)
+
+    '''
+    Path of the parent pom.xml named by <relativePath> (default ../pom.xml),
+    None if there is no parent, the lookup is disabled or the file is missing.
+    '''
+    def relative_parent_pom(self):
+        if not self.parent or not self.pom_file:
+            return None
+        return relative_parent_pom(self.pom_file, self.parent['relativePath'])
+
+    '''
+    Expands ${...} references against project.*, properties (inherited
+    ones included) and env.*.  Unknown references are left as is.
+    '''
+    def interpolate(self, value):
+        for attempt in range(10):
+            if '${' not in value:
+                break
+            expanded = property_reference_pattern.sub(self.expand_reference, value)
+            if expanded == value:
+                break
+            value = expanded
+        return value
+
+    def expand_reference(self, match):
+        name = match.group(1)
+        value = self.lookup_property(name)
+        if value == None:
+            return match.group(0)
+        return value
+
+    def lookup_property(self, name):
+        if name in self.properties:
+            return self.properties[name]
+        for prefix in ('project.', 'pom.'):
+            if name.startswith(prefix):
+                attr = name[len(prefix):]
+                if attr == 'basedir':
+                    return os.path.dirname(self.pom_file)
+                if attr in ('groupId', 'artifactId', 'version', 'packaging'):
+                    return getattr(self, attr)
+                if attr.startswith('parent.') and self.parent:
+                    return self.parent.get(attr[len('parent.'):])
+        if name.startswith('parent.') and self.parent:
+            return self.parent.get(name[len('parent.'):])
+        if name == 'basedir':
+            return os.path.dirname(self.pom_file)
+        if name.startswith('env.'):
+            return os.environ.get(name[len('env.'):])
+        return None
+
+    '''
+    Returns this (raw) model merged on top of the merged parent model:
+    coordinates, properties, dependencyManagement and dependencies are inherited,
+    child entries overriding parent ones.  Nothing is interpolated yet.
+    '''
+    def merge(self, parent_model):
+        merged = PomModel(self.pom_file)
+        merged.parent = self.parent
+        merged.modules = self.modules[:]
+        merged.groupId = self.groupId
+        merged.artifactId = self.artifactId
+        merged.version = self.version
+        merged.packaging = self.packaging
+        merged.has_profile_dependencies = self.has_profile_dependencies or \
+            bool(parent_model and parent_model.has_profile_dependencies)
+        if parent_model:
+            merged.properties.update(parent_model.properties)
+            merged.groupId = merged.groupId or parent_model.groupId
+            merged.version = merged.version or parent_model.version
+        elif self.parent:
+            merged.groupId = merged.groupId or self.parent['groupId']
+            merged.version = merged.version or self.parent['version']
+        merged.properties.update(self.properties)
+
+        inherited_management = []
+        inherited_dependencies = []
+        if parent_model:
+            inherited_management = parent_model.dependency_management
+            inherited_dependencies = parent_model.dependencies
+        merged.dependency_management = merge_dependencies(inherited_management, self.dependency_management)
+        merged.dependencies = merge_dependencies(inherited_dependencies, self.dependencies)
+        return merged
+
+    '''
+    Returns the effective model of a merged model: every value interpolated
+    (as Maven does, after inheritance) and dependencyManagement applied to
+    the dependencies.
+    '''
+    def interpolated(self):
+        effective = PomModel(self.pom_file)
+        effective.parent = self.parent
+        effective.properties = self.properties
+        effective.has_profile_dependencies = self.has_profile_dependencies
+        for attr in ('groupId', 'artifactId', 'version', 'packaging'):
+            value = getattr(self, attr)
+            if value:
+                value = self.interpolate(value)
+            setattr(effective, attr, value)
+        effective.packaging = effective.packaging or 'jar'
+        effective.modules = [self.interpolate(module) for module in self.modules]
+
+        managed = {}
+        for dependency in self.dependency_management:
+            dependency = dependency.copy(self.interpolate)
+            managed[dependency.management_key()] = dependency
+        effective.dependency_management = managed.values()
+        effective.dependencies = [effective.apply_management(dependency.copy(self.interpolate), managed)
+            for dependency in self.dependencies]
+        return effective
+
+    def apply_management(self, dependency, managed):
+        managed_dependency = managed.get(dependency.management_key())
+        if not managed_dependency:
+            return dependency
+        dependency = dependency.copy()
+        dependency.version = dependency.version or managed_dependency.version
+        dependency.scope = dependency.scope or managed_dependency.scope
+        if not dependency.exclusions:
+            dependency.exclusions = managed_dependency.exclusions[:]
+        return dependency
+
+'''
+Inherited dependencies followed by own ones, an own dependency replacing
+an inherited one with the same management key.
+'''
+def merge_dependencies(inherited, own):
+    dependencies = []
+    dependency_idx = {}
+    for dependency in inherited + own:
+        key = dependency.management_key()
+        if key in dependency_idx:
+            dependencies[dependency_idx[key]] = dependency
+        else:
+            dependency_idx[key] = len(dependencies)
+            dependencies.append(dependency)
+    return dependencies
+
+pom_model_cache = LruCache(1024)
+
+'''
+Returns the raw PomModel of pom_file, parsed at most once per file modification.
+'''
+def read_pom_model(pom_file):
+    pom_file = os.path.normpath(os.path.abspath(pom_file))
+    cache_key = (pom_file, os.path.getmtime(pom_file))
+    model = pom_model_cache.get(cache_key)
+    if model == None:
+        model = PomModel().parse(pom_file)
+        pom_model_cache.put(cache_key, model)
+    return model
+
+'''
+Returns the effective PomModel of pom_file.  The <parent> is taken from
+<relativePath> when its coordinates match, otherwise parent_locator (if given)
+is called with (groupId, artifactId, version) and should return the path
+of the parent pom or None.
+'''
+def load_pom_model(pom_file, parent_locator = None):
+    return merged_pom_model(pom_file, parent_locator, set()).interpolated()
+
+def merged_pom_model(pom_file, parent_locator, visited):
+    model = read_pom_model(pom_file)
+    visited.add(model.pom_file)
+
+    parent_model = None
+    if model.parent:
+        parent_pom = model.relative_parent_pom()
+        if parent_pom:
+            parent_raw = read_pom_model(parent_pom)
+            if parent_raw.artifactId != model.parent['artifactId']:
+                parent_pom = None
+        if not parent_pom and parent_locator:
+            parent_pom = parent_locator(model.parent['groupId'], model.parent['artifactId'], model.parent['version'])
+        if parent_pom and os.path.normpath(os.path.abspath(parent_pom)) not in visited:
+            parent_model = merged_pom_model(parent_pom, parent_locator, visited)
+    return model.merge(parent_model)
+
+'''
+Path of the parent pom.xml of pom_file given its <relativePath> (None for
+the default ../pom.xml, '' when the lookup is disabled), None if it is
+not on disk.
+'''
+def relative_parent_pom(pom_file, relative_path):
+    if relative_path == None:
+        relative_path = os.path.join('..', 'pom.xml')
+    elif len(relative_path) == 0:
+        return None
+    parent_pom = os.path.normpath(os.path.join(os.path.dirname(pom_file), relative_path))
+    if os.path.isdir(parent_pom):
+        parent_pom = os.path.join(parent_pom, 'pom.xml')
+    if os.path.isfile(parent_pom):
+        return parent_pom
+    return None
+
+def encode_path(path):
+    if isinstance(path, unicode):
+        return path.encode('utf-8')
+    return path
+
+'''
+Feeds the bytes of pom_file into digest and returns its parent pom on disk
+(see relative_parent_pom), read in the same pass with PomParentReader rather
+than by building the element tree.
+'''
+def update_pom_digest(digest, pom_file):
+    parent_reader = PomParentReader()
+    feed, close = pom_event_parser(parent_reader)
+    parsing = True
+    pom_file_obj = open(pom_file, 'rb')
+    try:
+        while True:
+            data = pom_file_obj.read(8192)
+            if not data:
+                break
+            digest.update(data)
+            if parsing:
+                try:
+                    feed(data)
+                except PomHeaderComplete:
+                    parsing = False
+        if parsing:
+            try:
+                close()
+            except PomHeaderComplete:
+                pass
+    finally:
+        pom_file_obj.close()
+    if not parent_reader.has_parent:
+        return None
+    return relative_parent_pom(pom_file, parent_reader.relative_path)
+
+'''
+SHA-1 digest of a pom.xml, every parent pom reachable on disk and the
+m2 settings file in use.  Any change to one of these can change the
+resolved classpath of the module.
+'''
+def pom_digest(pom_file, m2_settings = None):
+    digest = hashlib.sha1()
+    visited = set()
+    cur_pom = os.path.normpath(os.path.abspath(pom_file))
+    while cur_pom and cur_pom not in visited:
+        visited.add(cur_pom)
+        digest.update(encode_path(cur_pom))
+        cur_pom = update_pom_digest(digest, cur_pom)
+    if m2_settings:
+        digest.update(encode_path(m2_settings))
+        if os.path.isfile(m2_settings):
+            settings_file_obj = open(m2_settings, 'rb')
+            digest.update(settings_file_obj.read())
+            settings_file_obj.close()
+    return digest.hexdigest()
+
+
+'''
+Base mvn command line (platform specific executable plus optional -s settings)
+and the startupinfo hiding the console window on Windows.
+'''
+def mvn_command(m2_settings = None):
+    mvn_cmd = None
+    if os.name == 'nt':
+        mvn_cmd = ['mvn.bat']
+    else:
+        mvn_cmd = ['mvn']
+    if m2_settings:
+        mvn_cmd += ['-s', m2_settings]
+    return mvn_cmd
+
+def mvn_startupinfo():
+    startupinfo = None
+    if os.name == "nt":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    return startupinfo
+
 '''
-Use 'mvn -N dependency:build-classpath' to generate the classpath for the specified pom file
+Returns the set of module directories built by the reactor rooted at
+aggregator_path, following <modules> entries recursively (taken from
+pom_index for the poms it holds).
+'''
+def find_reactor_modules(aggregator_path):
+    reactor_modules = set()
+    pending = [os.path.normpath(aggregator_path)]
+    while pending:
+        module_path = pending.pop()
+        pom_file = os.path.join(module_path, 'pom.xml')
+        if module_path in reactor_modules or not os.path.isfile(pom_file):
+            continue
+        reactor_modules.add(module_path)
+        child_paths = None
+        if pom_index != None:
+            child_paths = pom_index.modules(module_path)
+        if child_paths == None:
+            child_paths = [os.path.normpath(os.path.join(module_path, module)) for module in read_pom_model(pom_file).modules]
+        for child_path in child_paths:
+            if os.path.isfile(child_path):
+                # <module> may name the pom file itself
+                child_path = os.path.dirname(child_path)
+            pending.append(child_path)
+    return reactor_modules
+
+'''
+Classpath entries of a dependency:build-classpath line, in Maven's order
+(duplicates dropped).
+'''
+def read_classpath_line(cp_line):
+    classpath = []
+    for jar in cp_line.split(os.pathsep):
+        jar = jar.strip()
+        if jar and jar not in classpath:
+            classpath.append(jar)
+    return classpath
+
+
+'''
+Classpath of the module at pom_path from offline_resolver (a callable taking
+the module path and m2 settings, see resolver.resolve_classpath), or None
+if the resolver could not do without mvn.
+'''
+def resolve_offline(offline_resolver, pom_path, m2_settings = None):
+    try:
+        return list(offline_resolver(pom_path, m2_settings))
+    except Exception, e:
+        print 'offline classpath resolution for %s fell back to mvn: %s' % (pom_path, e)
+        return None
+
+'''
+Use 'mvn -N dependency:build-classpath' to generate the classpath for the specified pom file.
+When a ClasspathCache is given, modules whose pom digest is unchanged are served from it
+and no mvn process is started; the same goes for modules the offline_resolver can resolve.
+The pom digest is computed here unless the caller already has it.
 '''
 class MvnClasspathGrabbingThread(threading.Thread):
-    def __init__(self, pom_path):
+    def __init__(self, pom_path, m2_settings = None, cache = None, offline_resolver = None, digest = None):
         self.pom_path = pom_path
-        self.classpath = set()
+        self.m2_settings = m2_settings
+        self.cache = cache
+        self.offline_resolver = offline_resolver
+        self.digest = digest
+        # in Maven's order
+        self.classpath = []
         self.dest_classpath = None
         threading.Thread.__init__(self)
 
     def run(self):
-        curdir = os.getcwd()
-        os.chdir(self.pom_path)
-        mvn = None
-        if os.name == 'nt':
-            mvn = 'mvn.bat'
-        else:
-            mvn = 'mvn'
-        # Hide the console window on Windows
-        startupinfo = None
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-        mvn_proc = subprocess.Popen([mvn,'-N','dependency:build-classpath'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=startupinfo, universal_newlines=True)
+        digest = self.digest
+        if self.cache:
+            if digest == None:
+                digest = pom_digest(os.path.join(self.pom_path, 'pom.xml'), self.m2_settings)
+            cached_classpath = self.cache.get(self.pom_path, digest)
+            if cached_classpath != None:
+                self.classpath = list(cached_classpath)
+                return
+
+        if self.offline_resolver:
+            offline_classpath = resolve_offline(self.offline_resolver, self.pom_path, self.m2_settings)
+            if offline_classpath != None:
+                self.classpath = offline_classpath
+                if self.cache:
+                    self.cache.put(self.pom_path, digest, self.classpath)
+                return
+
+        mvn_cmd = mvn_command(self.m2_settings) + ['-N','dependency:build-classpath']
+        # run in the module dir via cwd rather than os.chdir, other classpath threads run concurrently
+        mvn_proc = subprocess.Popen(mvn_cmd, cwd=self.pom_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=mvn_startupinfo(), universal_newlines=True)
         mvn_output, mvn_err = mvn_proc.communicate()
         # print mvn_output
-        os.chdir(curdir)
         cp_line = None
         for line in StringIO(mvn_output):
             not_cp_line = non_cp_mvn_output_pattern.match(line)
@@ -131,135 +825,409 @@ class MvnClasspathGrabbingThread(threading.Thread):
                 break
         # print '%s -- %s' % (pom_path, cp_line)
         if cp_line:
-            jars = cp_line.split(os.pathsep)
-            for jar in jars:
-                self.classpath.add(jar.strip())
+            self.classpath = read_classpath_line(cp_line)
+            if self.cache and mvn_proc.returncode == 0:
+                self.cache.put(self.pom_path, digest, self.classpath)
         else:
             print 'WARNING: no classpath found for pom file in path %s' % self.pom_path
 
 
+'''
+Runs a single reactor-wide 'mvn dependency:build-classpath' from the aggregator pom,
+each module writing its classpath to target/sublime-maven.classpath, and collects
+the results into self.classpaths (module path -> list of jars).
+Modules that produced no output file are left out so the caller can fall back
+to MvnClasspathGrabbingThread for them.
+digests (module path -> pom digest) spares recomputing the ones the caller has.
+'''
+class MvnReactorClasspathThread(threading.Thread):
+    output_file = os.path.join('target', 'sublime-maven.classpath')
+
+    def __init__(self, aggregator_path, module_paths, m2_settings = None, cache = None, offline_resolver = None, digests = None):
+        self.aggregator_path = aggregator_path
+        self.module_paths = module_paths
+        self.m2_settings = m2_settings
+        self.cache = cache
+        self.offline_resolver = offline_resolver
+        self.digests = digests or {}
+        self.classpaths = {}
+        threading.Thread.__init__(self)
+
+    def run(self):
+        digests = dict(self.digests)
+        if self.cache:
+            for module_path in self.module_paths:
+                if digests.get(module_path) == None:
+                    digests[module_path] = pom_digest(os.path.join(module_path, 'pom.xml'), self.m2_settings)
+                cached_classpath = self.cache.get(module_path, digests[module_path])
+                if cached_classpath != None:
+                    self.classpaths[module_path] = list(cached_classpath)
+        if self.offline_resolver:
+            for module_path in self.module_paths:
+                if module_path in self.classpaths:
+                    continue
+                offline_classpath = resolve_offline(self.offline_resolver, module_path, self.m2_settings)
+                if offline_classpath != None:
+                    self.classpaths[module_path] = offline_classpath
+                    if self.cache:
+                        self.cache.put(module_path, digests[module_path], offline_classpath)
+        if len(self.classpaths) == len(self.module_paths):
+            return
+
+        # stale output from a previous run must not be mistaken for a result
+        for module_path in self.module_paths:
+            module_output_file = os.path.join(module_path, self.output_file)
+            if os.path.isfile(module_output_file):
+                os.remove(module_output_file)
+
+        mvn_cmd = mvn_command(self.m2_settings) + ['-fae', 'dependency:build-classpath',
+            '-Dmdep.outputFile=' + self.output_file]
+        mvn_proc = subprocess.Popen(mvn_cmd, cwd=self.aggregator_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, startupinfo=mvn_startupinfo(), universal_newlines=True)
+        mvn_proc.communicate()
+
+        for module_path in self.module_paths:
+            if module_path in self.classpaths:
+                continue
+            module_output_file = os.path.join(module_path, self.output_file)
+            if not os.path.isfile(module_output_file):
+                print 'WARNING: reactor produced no classpath for module in path %s' % module_path
+                continue
+            cp_file = open(module_output_file, 'r')
+            self.classpaths[module_path] = read_classpath_line(cp_file.read())
+            cp_file.close()
+            if self.cache:
+                self.cache.put(module_path, digests[module_path], self.classpaths[module_path])
+
+
+'''
+Pool worker: takes module paths off a shared queue until it is empty, resolving
+each with MvnClasspathGrabbingThread.run() in this thread, so a slow module only
+ever occupies one slot.
+'''
+class ClasspathWorkerThread(threading.Thread):
+    def __init__(self, pending, results, timings, lock, m2_settings = None, cache = None, offline_resolver = None, digests = None):
+        self.pending = pending
+        self.results = results
+        self.timings = timings
+        self.lock = lock
+        self.m2_settings = m2_settings
+        self.cache = cache
+        self.offline_resolver = offline_resolver
+        self.digests = digests or {}
+        threading.Thread.__init__(self)
+
+    def run(self):
+        while True:
+            try:
+                module_path = self.pending.get_nowait()
+            except Queue.Empty:
+                return
+            start_time = time.time()
+            cp_grabber = MvnClasspathGrabbingThread(module_path, self.m2_settings, self.cache, self.offline_resolver,
+                self.digests.get(module_path))
+            cp_grabber.run()
+            with self.lock:
+                self.results[module_path] = cp_grabber.classpath
+                self.timings[module_path] = time.time() - start_time
+
+def default_classpath_workers():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 4
+
+
+# directory names never searched for pom.xml files
+default_exclude_patterns = ['.*', 'target']
+
+def pom_declares_modules(pom_file):
+    try:
+        return len(read_pom_model(pom_file).modules) > 0
+    except Exception:
+        # unreadable pom, keep searching below it
+        return True
+
+'''
+Directory walker sharing a queue of directories with its siblings, so
+independent subtrees are listed concurrently.  Directories matching one of
+exclude_patterns (fnmatch globs) are pruned, as are directories below a pom
+without <modules> when stop_at_leaf_modules is set.
+'''
+class PomPathWalkerThread(threading.Thread):
+    def __init__(self, pending, pom_paths, lock, exclude_patterns, stop_at_leaf_modules = False):
+        self.pending = pending
+        self.pom_paths = pom_paths
+        self.lock = lock
+        self.exclude_patterns = exclude_patterns
+        self.stop_at_leaf_modules = stop_at_leaf_modules
+        threading.Thread.__init__(self)
+
+    def run(self):
+        while True:
+            dirname = self.pending.get()
+            if dirname == None:
+                self.pending.task_done()
+                return
+            try:
+                self.visit(dirname)
+            finally:
+                self.pending.task_done()
+
+    def visit(self, dirname):
+        try:
+            names = os.listdir(dirname)
+        except OSError:
+            return
+        if 'pom.xml' in names:
+            with self.lock:
+                self.pom_paths.append(dirname)
+            if self.stop_at_leaf_modules and not pom_declares_modules(os.path.join(dirname, 'pom.xml')):
+                return
+        for name in names:
+            if self.is_excluded(name):
+                continue
+            child_path = os.path.join(dirname, name)
+            try:
+                # lstat: symlinked directories are not followed, same as os.path.walk
+                is_dir = stat.S_ISDIR(os.lstat(child_path).st_mode)
+            except OSError:
+                continue
+            if is_dir:
+                self.pending.put(child_path)
+
+    def is_excluded(self, name):
+        for pattern in self.exclude_patterns:
+            if fnmatch.fnmatch(name, pattern):
+                return True
+        return False
+
+'''
+Returns the sorted list of directories under root_path holding a pom.xml.
+'''
+def discover_pom_paths(root_path, exclude_patterns = None, stop_at_leaf_modules = False, walker_threads = 4):
+    if exclude_patterns == None:
+        exclude_patterns = default_exclude_patterns
+    pending = Queue.Queue()
+    pending.put(root_path)
+    pom_paths = []
+    lock = threading.Lock()
+    walkers = []
+    for idx in range(walker_threads):
+        walker = PomPathWalkerThread(pending, pom_paths, lock, exclude_patterns, stop_at_leaf_modules)
+        walkers.append(walker)
+        walker.start()
+    pending.join()
+    for walker in walkers:
+        pending.put(None)
+    for walker in walkers:
+        walker.join()
+    return sorted(pom_paths)
+
+
 '''
 PomProjectGeneratorThread: walks a directory tree, searching for all
 pom.xml files and generating a project config view result from the findings
 '''
 class PomProjectGeneratorThread(threading.Thread):
-    def __init__(self, target_path, window, long_project_names = False, project_per_pom = False):
+    def __init__(self, target_path, window, long_project_names = False, project_per_pom = False, m2_settings = None, classpath_cache = None,
+            reactor_classpath = False, classpath_workers = None, exclude_patterns = None, stop_at_leaf_modules = False,
+            offline_resolver = None, manifest = None, incremental = False):
         self.target_path = target_path
         self.window = window
         self.project_file_name = os.path.basename(target_path) + '.sublime-project'
         self.long_project_names = long_project_names
         self.project_per_pom = project_per_pom
-        self.merged_classpath = set()
+        self.m2_settings = m2_settings
+        self.classpath_cache = classpath_cache
+        self.reactor_classpath = reactor_classpath
+        self.classpath_workers = classpath_workers or default_classpath_workers()
+        self.classpath_timings = {}
+        self.exclude_patterns = exclude_patterns
+        self.stop_at_leaf_modules = stop_at_leaf_modules
+        self.offline_resolver = offline_resolver
+        self.manifest = manifest
+        self.incremental = incremental
+        self.merged_classpath = classpath.MergedClasspath()
         threading.Thread.__init__(self)
 
     def run(self):
         self.result = None
-        pom_paths = []
-        os.path.walk(self.target_path, self.find_pom_paths, pom_paths)
+        pom_paths = self.find_pom_paths()
+        modules = self.load_modules([pom_path['path'] for pom_path in pom_paths])
 
         if self.project_per_pom:
             self.result = []
             for pom_path in pom_paths:
+                # generate project name
+                pom_path['name'] = modules[pom_path['path']]['name']
+                # pom_path['folder_exclude_patterns'] = ['target']
                 self.result.append({ "folders": [pom_path] })
         else:
             self.result = { "folders": [] }
-
-        cp_threads = []
-        finished_cp_threads = []
-        max_cp_threads = 4
-
-        if self.project_per_pom:
-            for project in self.result:
-                # generate project name
-                project['folders'][0]['name'] = self.gen_project_name(os.path.join(project['folders'][0]['path'], 'pom.xml'))
-                # project['folders'][0]['folder_exclude_patterns'] = ['target']
-                # grab classpath entries
-                cp_thread = MvnClasspathGrabbingThread(project['folders'][0]['path'])
-                cp_threads.append(cp_thread)
-                cp_thread.start()
-                # add pom_path/target/classes to classpath
-                project['settings'] = { 'sublimejava_classpath': [
-                        os.path.join(project['folders'][0]['path'], 'target', 'classes'),
-                        os.path.join(project['folders'][0]['path'], 'target', 'test-classes')
-                    ] }
-                if len(cp_threads) == max_cp_threads:
-                    for cp_thread in cp_threads:
-                        cp_thread.join()
-                        finished_cp_threads.append(cp_thread)
-                    del cp_threads[:]
-        else:
             # set for sorting by generated project names
             pom_paths_by_names = {}
             for pom_path in pom_paths:
-                proj_name = self.gen_project_name(os.path.join(pom_path['path'], 'pom.xml'))
+                proj_name = modules[pom_path['path']]['name']
                 pom_paths_by_names[proj_name] = pom_path
-            # for project_entry in self.result['folders']:
             for name_and_path in sorted(pom_paths_by_names.items()):
                 # generate project entry
                 project_entry = name_and_path[1]
                 project_entry['name'] = name_and_path[0]
                 # project_entry['folder_exclude_patterns'] = ['target']
                 self.result['folders'].append(project_entry)
-                # grab classpath entries
-                cp_thread = MvnClasspathGrabbingThread(project_entry['path'])
-                cp_threads.append(cp_thread)
-                # print 'starting cp thread for %s' % project_entry['path']
-                cp_thread.start()
-                self.merged_classpath.add(os.path.join(project_entry['path'], 'target', 'classes'))
-                self.merged_classpath.add(os.path.join(project_entry['path'], 'target', 'test-classes'))
-                if len(cp_threads) == max_cp_threads:
-                    for cp_thread in cp_threads:
-                        cp_thread.join()
-                        self.merged_classpath.update(cp_thread.classpath)
-                    del cp_threads[:]
-
-        # print len(cp_threads)
-        for cp_thread in cp_threads:
-            # print 'waiting on cp_thread'
-            cp_thread.join()
-            if self.project_per_pom:
-                finished_cp_threads.append(cp_thread)
-            # print cp_thread.classpath
-            self.merged_classpath.update(cp_thread.classpath)
 
         if not self.project_per_pom:
-            self.result['settings'] = { 'sublimejava_classpath': list(self.merged_classpath) }
+            for project_entry in self.result['folders']:
+                self.merged_classpath.add(os.path.join(project_entry['path'], 'target', 'classes'))
+                self.merged_classpath.add(os.path.join(project_entry['path'], 'target', 'test-classes'))
+                self.merged_classpath.update(modules[project_entry['path']]['classpath'])
+            self.result['settings'] = { 'sublimejava_classpath': self.merged_classpath.entries }
+            print self.merged_classpath.report()
         else:
-            for idx in range(len(self.result)):
-                self.result[idx]['settings']['sublimejava_classpath'].extend(finished_cp_threads[idx].classpath)
+            for project in self.result:
+                project_path = project['folders'][0]['path']
+                # add pom_path/target/classes to classpath
+                project['settings'] = { 'sublimejava_classpath': [
+                        os.path.join(project_path, 'target', 'classes'),
+                        os.path.join(project_path, 'target', 'test-classes')
+                    ] }
+                project['settings']['sublimejava_classpath'].extend(modules[project_path]['classpath'])
 
-        # print self.merged_classpath
         sublime.set_timeout(lambda: self.publish_config_view(), 100)
 
+    '''
+    Returns { module path: { 'digest', 'name', 'classpath' } }.  In incremental
+    mode modules whose pom digest matches the manifest are taken from it, only
+    the others (self.changed_paths) get their name parsed and classpath resolved.
+    Pom digests are computed once per module, and only when the incremental mode
+    or the classpath cache needs them; the manifest is recorded along with them.
+    '''
+    def load_modules(self, module_paths):
+        options = { 'long_project_names': self.long_project_names, 'project_per_pom': self.project_per_pom }
+        previous = {}
+        if self.manifest and self.incremental:
+            previous = self.manifest.get(self.target_path, options)
+        with_digests = self.incremental or self.classpath_cache != None
+
+        modules = {}
+        digests = {}
+        self.changed_paths = []
+        for module_path in module_paths:
+            digest = None
+            if with_digests:
+                digest = pom_digest(os.path.join(module_path, 'pom.xml'), self.m2_settings)
+                digests[module_path] = digest
+            entry = previous.get(module_path)
+            if entry and entry.get('digest') == digest:
+                modules[module_path] = entry
+            else:
+                modules[module_path] = { 'digest': digest, 'name': self.gen_project_name(os.path.join(module_path, 'pom.xml')) }
+                self.changed_paths.append(module_path)
+        self.removed_paths = [module_path for module_path in previous if module_path not in modules]
+
+        module_classpaths = self.resolve_classpaths(self.changed_paths, digests)
+        for module_path in self.changed_paths:
+            modules[module_path]['classpath'] = list(module_classpaths[module_path])
+
+        if self.classpath_cache:
+            self.classpath_cache.save()
+        if self.manifest and with_digests:
+            self.manifest.put(self.target_path, options, modules)
+            self.manifest.save()
+        if self.incremental:
+            print '%d of %d modules changed, %d removed since the last generation' % (len(self.changed_paths),
+                len(module_paths), len(self.removed_paths))
+        return modules
+
+    '''
+    Returns a dict of module path -> list of classpath entries (in Maven's order).
+    In reactor mode a single mvn run from the aggregator pom resolves every module,
+    provided the aggregator's <modules> cover everything the walk found;
+    any module left unresolved falls back to a per-module 'mvn -N' run, spread over
+    a pool of self.classpath_workers threads.  digests (module path -> pom digest)
+    are handed on to the classpath cache lookups.
+    '''
+    def resolve_classpaths(self, module_paths, digests = None):
+        module_classpaths = {}
+
+        if self.reactor_classpath and module_paths:
+            aggregator_path = os.path.normpath(self.target_path)
+            if not os.path.isfile(os.path.join(aggregator_path, 'pom.xml')):
+                aggregator_path = module_paths[0]
+            reactor_modules = find_reactor_modules(aggregator_path)
+            if set([os.path.normpath(path) for path in module_paths]).issubset(reactor_modules):
+                reactor_thread = MvnReactorClasspathThread(aggregator_path, module_paths, self.m2_settings, self.classpath_cache,
+                    self.offline_resolver, digests)
+                reactor_thread.start()
+                reactor_thread.join()
+                module_classpaths.update(reactor_thread.classpaths)
+            else:
+                print 'WARNING: %s does not aggregate every pom found, resolving classpaths per module' % aggregator_path
+
+        pending = Queue.Queue()
+        for module_path in module_paths:
+            if module_path not in module_classpaths:
+                pending.put(module_path)
+
+        # results are keyed by module path, callers assemble them in walk order
+        lock = threading.Lock()
+        workers = []
+        for idx in range(min(self.classpath_workers, pending.qsize())):
+            worker = ClasspathWorkerThread(pending, module_classpaths, self.classpath_timings, lock,
+                self.m2_settings, self.classpath_cache, self.offline_resolver, digests)
+            workers.append(worker)
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        for module_path in module_paths:
+            if module_path in self.classpath_timings:
+                print 'classpath for %s resolved in %.2fs' % (module_path, self.classpath_timings[module_path])
+
+        return module_classpaths
+
+    '''
+    Project name from the coordinates of pom_path, as held by pom_index when
+    it covers the pom, read from the pom header otherwise.
+    '''
     def gen_project_name(self, pom_path):
         pom_handler = PomHandler()
-        pom_handler.parse(pom_path)
+        coordinates = None
+        if pom_index != None:
+            coordinates = pom_index.coordinates(os.path.dirname(pom_path))
+        if coordinates and coordinates[0] and coordinates[1]:
+            pom_handler.groupId, pom_handler.artifactId = coordinates[:2]
+        else:
+            pom_handler.parse_header(pom_path)
         return pom_handler.get_project_name(self.long_project_names)
 
     '''
-    An os.path.walk() visit function that expects as an arg an empty list.  
-    Folder paths are added to the pom_path list
-    when a pom.xml file is found (hidden paths and 'target' dirs skipped).
+    Returns a folder entry ({ "path": dirname }) for every directory under
+    target_path holding a pom.xml file (excluded dirs skipped, see discover_pom_paths),
+    from pom_index when it covers target_path.
     '''
-    def find_pom_paths(self, pom_paths, dirname, names):
-        # print project_config
-        # print 'dirname=' + dirname
-        if 'pom.xml' in names:
+    def find_pom_paths(self):
+        pom_dirs = None
+        if pom_index != None:
+            pom_dirs = pom_index.pom_paths(self.target_path, self.exclude_patterns, self.stop_at_leaf_modules)
+        if pom_dirs == None:
+            pom_dirs = discover_pom_paths(self.target_path, self.exclude_patterns, self.stop_at_leaf_modules)
+        pom_paths = []
+        for dirname in pom_dirs:
             pom_paths.append({ "path": dirname })
-        tmpnames = names[:]
-        for name in tmpnames:
-            # skip hiddens
-            if name[0] == '.' or name == 'target':
-                names.remove(name)
+        return pom_paths
 
     def publish_config_view(self):
         if self.project_per_pom:
             for project in self.result:
-                project_file_path = os.path.join(project['folders'][0]['path'],
-                    os.path.basename(project['folders'][0]['path']) + '.sublime-project')
-                project_file = open(project_file_path, 'w+')
+                if self.incremental and project['folders'][0]['path'] not in self.changed_paths \
+                        and os.path.isfile(self.project_file_path(project['folders'][0]['path'])):
+                    continue
+                project_file = open(self.project_file_path(project['folders'][0]['path']), 'w+')
                 json.dump(project, project_file, indent = 4)
                 project_file.close()
+        elif self.incremental and os.path.isfile(self.project_file_path(self.target_path)):
+            self.update_project_file(self.project_file_path(self.target_path))
         else:
             project_view = self.window.new_file()
             project_edit = project_view.begin_edit()
@@ -267,3 +1235,48 @@ class PomProjectGeneratorThread(threading.Thread):
             project_view.end_edit(project_edit)
             project_view.set_name(self.project_file_name)
             project_view.set_scratch(True)
+
+    def project_file_path(self, project_dir):
+        return os.path.join(project_dir, os.path.basename(os.path.normpath(project_dir)) + '.sublime-project')
+
+    '''
+    Merges the result into an existing project file: folders of modules found
+    are updated in place (keeping their path as written and any key added by
+    hand), new modules are appended, removed ones dropped, the classpath setting
+    is updated, and any other folder, setting or key is left as it is.
+    '''
+    def update_project_file(self, project_file_path):
+        if not self.changed_paths and not self.removed_paths:
+            return
+        project_file = open(project_file_path, 'r')
+        try:
+            project = json.load(project_file)
+        except ValueError:
+            print 'WARNING: cannot merge into unreadable project file %s' % project_file_path
+            return
+        finally:
+            project_file.close()
+
+        project_dir = os.path.dirname(project_file_path)
+        generated_folders = {}
+        for folder in self.result['folders']:
+            generated_folders[os.path.normpath(folder['path'])] = folder
+        removed_paths = set([os.path.normpath(path) for path in self.removed_paths])
+        folders = []
+        for folder in project.get('folders', []):
+            folder_path = os.path.normpath(os.path.join(project_dir, folder.get('path', '')))
+            if folder_path in removed_paths:
+                continue
+            generated_folder = generated_folders.pop(folder_path, None)
+            if generated_folder:
+                for key, value in generated_folder.items():
+                    if key != 'path':
+                        folder[key] = value
+            folders.append(folder)
+        project['folders'] = folders + [folder for folder in self.result['folders']
+            if os.path.normpath(folder['path']) in generated_folders]
+        project.setdefault('settings', {})['sublimejava_classpath'] = self.result['settings']['sublimejava_classpath']
+
+        project_file = open(project_file_path, 'w')
+        json.dump(project, project_file, indent = 4)
+        project_file.close()
@@ -0,0 +1,165 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os, json, re, time, threading
+from utils.mvn.output import building_module_pattern
+
+mojo_start_pattern = re.compile(r'^\[INFO\] --- ([\w.\-]+):([\w.\-${}]+):([\w.\-]+) \(([^)]*)\) @ ([\w.\-]+) ---')
+build_end_pattern = re.compile(r'^\[INFO\] (BUILD (SUCCESS|FAILURE)|Reactor Summary)')
+
+'''
+BuildProfiler: fed raw stdout chunks (with their arrival time) on the reader
+thread, detects module ('Building ...') and plugin execution
+('--- plugin:version:goal (id) @ module ---') boundaries and measures how long
+each module and mojo ran.
+'''
+class BuildProfiler(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.partial_line = ''
+        self.start_time = None
+        self.end_time = None
+        # [name, seconds] in build order
+        self.modules = []
+        # [module, 'plugin:goal (execution)', seconds] in build order
+        self.mojos = []
+        self.current_module = None
+        self.current_mojo = None
+
+    def feed(self, data, now = None):
+        if now == None:
+            now = time.time()
+        with self.lock:
+            if self.start_time == None:
+                self.start_time = now
+            lines = (self.partial_line + data).split('\n')
+            self.partial_line = lines.pop()
+            for line in lines:
+                self.parse_line(line.rstrip('\r'), now)
+
+    def parse_line(self, line, now):
+        if not line.startswith('[INFO] '):
+            return
+        match = mojo_start_pattern.match(line)
+        if match:
+            self.end_mojo(now)
+            plugin = match.group(1)
+            if plugin.startswith('maven-') and plugin.endswith('-plugin'):
+                plugin = plugin[len('maven-'):-len('-plugin')]
+            self.current_mojo = [match.group(5), '%s:%s (%s)' % (plugin, match.group(3), match.group(4)), now]
+            return
+        match = building_module_pattern.match(line)
+        if match:
+            self.end_module(now)
+            # 'Building <name> <version>'
+            self.current_module = [match.group(1).strip().rsplit(' ', 1)[0], now]
+            return
+        if build_end_pattern.match(line):
+            self.end_module(now)
+
+    def end_mojo(self, now):
+        if self.current_mojo:
+            module, mojo, started = self.current_mojo
+            self.mojos.append([module, mojo, now - started])
+            self.current_mojo = None
+
+    def end_module(self, now):
+        self.end_mojo(now)
+        if self.current_module:
+            name, started = self.current_module
+            self.modules.append([name, now - started])
+            self.current_module = None
+
+    '''
+    Closes the profile (at process exit) and returns it as a history entry.
+    '''
+    def close(self, now = None):
+        if now == None:
+            now = time.time()
+        with self.lock:
+            self.end_module(now)
+            self.end_time = now
+            total = 0.0
+            if self.start_time != None:
+                total = now - self.start_time
+            return {
+                'time': now,
+                'total': total,
+                'modules': self.modules[:],
+                'mojos': self.mojos[:]
+            }
+
+'''
+BuildHistory: build profiles per pom directory persisted as json, the most
+recent max_entries kept for each directory.
+'''
+class BuildHistory(object):
+    def __init__(self, history_file, max_entries = 50):
+        self.history_file = history_file
+        self.max_entries = max_entries
+        self.entries = {}
+        if history_file and os.path.isfile(history_file):
+            history_file_obj = open(history_file, 'r')
+            try:
+                self.entries = json.load(history_file_obj)
+            except ValueError:
+                print 'WARNING: ignoring unreadable build history %s' % history_file
+            history_file_obj.close()
+
+    def add(self, pom_dir, goals, profile):
+        profile = dict(profile)
+        profile['goals'] = goals
+        builds = self.entries.setdefault(pom_dir, [])
+        builds.append(profile)
+        del builds[:-self.max_entries]
+
+    def save(self):
+        history_dir = os.path.dirname(self.history_file)
+        if history_dir and not os.path.isdir(history_dir):
+            os.makedirs(history_dir)
+        history_file_obj = open(self.history_file, 'w')
+        json.dump(self.entries, history_file_obj)
+        history_file_obj.close()
+
+    '''
+    Slowest modules and mojos of the last_n builds of pom_dir:
+    a list of (name, last seconds, average seconds, builds seen), slowest average first,
+    for modules and for mojos ('module plugin:goal (execution)').
+    '''
+    def slowest(self, pom_dir, last_n = 10):
+        builds = self.entries.get(pom_dir, [])[-last_n:]
+        module_times = {}
+        mojo_times = {}
+        for build in builds:
+            for name, seconds in build['modules']:
+                module_times.setdefault(name, []).append(seconds)
+            for module, mojo, seconds in build['mojos']:
+                mojo_times.setdefault('%s %s' % (module, mojo), []).append(seconds)
+        return rank_durations(module_times), rank_durations(mojo_times)
+
+def rank_durations(times):
+    ranked = []
+    for name, durations in times.items():
+        ranked.append((name, durations[-1], float(sum(durations)) / len(durations), len(durations)))
+    ranked.sort(key = lambda entry: entry[2], reverse = True)
+    return ranked
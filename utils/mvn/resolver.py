@@ -0,0 +1,227 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os
+from collections import deque
+from xml.etree import ElementTree
+from utils.mvn import pom
+
+# scope of a transitive dependency given the scope of the dependency that
+# pulled it in (rows) and its own declared scope (columns), None: dropped
+transitive_scopes = {
+    'compile': { 'compile': 'compile', 'runtime': 'runtime' },
+    'provided': { 'compile': 'provided', 'runtime': 'provided' },
+    'runtime': { 'compile': 'runtime', 'runtime': 'runtime' },
+    'test': { 'compile': 'test', 'runtime': 'test' },
+    'system': {}
+}
+
+# dependency type -> (file extension, implied classifier)
+artifact_types = {
+    'jar': ('jar', None),
+    'test-jar': ('jar', 'tests'),
+    'bundle': ('jar', None),
+    'ejb': ('jar', None),
+    'ejb-client': ('jar', 'client'),
+    'maven-plugin': ('jar', None),
+    'java-source': ('jar', 'sources'),
+    'javadoc': ('jar', 'javadoc'),
+    'pom': ('pom', None)
+}
+
+class ArtifactNotFound(Exception):
+    pass
+
+def read_local_repository(settings_file):
+    if not settings_file or not os.path.isfile(settings_file):
+        return None
+    for node in ElementTree.parse(settings_file).getroot():
+        if pom.local_tag_name(node) == 'localRepository' and node.text:
+            return os.path.expanduser(node.text.strip())
+    return None
+
+'''
+Local repository in use: <localRepository> of the m2 settings file given,
+then of ~/.m2/settings.xml, defaulting to ~/.m2/repository.
+'''
+def find_local_repository(m2_settings = None):
+    for settings_file in (m2_settings, os.path.join(os.path.expanduser('~'), '.m2', 'settings.xml')):
+        local_repository = read_local_repository(settings_file)
+        if local_repository:
+            return local_repository
+    return os.path.join(os.path.expanduser('~'), '.m2', 'repository')
+
+'''
+LocalRepositoryResolver: computes a module classpath the way
+'mvn dependency:build-classpath' does, reading poms and jars straight from the
+local repository instead of starting Maven.  Applies nearest-wins mediation,
+scope propagation, exclusions, optional flags and dependencyManagement
+(including import scoped boms).  Raises ArtifactNotFound whenever something it
+needs is not available locally (or needs Maven to decide, e.g. version ranges),
+in which case the caller should fall back to mvn.  Profiles are not evaluated,
+so any pom (of the module, its parents or a dependency) whose profiles add
+dependencies, dependencyManagement or properties is left to mvn as well.
+'''
+class LocalRepositoryResolver(object):
+    def __init__(self, local_repository):
+        self.local_repository = local_repository
+
+    def artifact_path(self, group_id, artifact_id, version, extension, classifier = None):
+        file_name = '%s-%s' % (artifact_id, version)
+        if classifier:
+            file_name += '-' + classifier
+        return os.path.join(self.local_repository, os.path.join(*group_id.split('.')),
+            artifact_id, version, file_name + '.' + extension)
+
+    def locate_pom(self, group_id, artifact_id, version):
+        if not group_id or not artifact_id or not version:
+            return None
+        pom_file = self.artifact_path(group_id, artifact_id, version, 'pom')
+        if os.path.isfile(pom_file):
+            return pom_file
+        return None
+
+    def load_model(self, group_id, artifact_id, version):
+        if not version or version[0] in '[(' or '${' in version:
+            raise ArtifactNotFound('%s:%s: cannot resolve version %s offline' % (group_id, artifact_id, version))
+        pom_file = self.locate_pom(group_id, artifact_id, version)
+        if not pom_file:
+            raise ArtifactNotFound('%s:%s:pom:%s' % (group_id, artifact_id, version))
+        return self.check_profiles(pom.load_pom_model(pom_file, self.locate_pom))
+
+    def check_profiles(self, model):
+        if model.has_profile_dependencies:
+            raise ArtifactNotFound('%s: dependencies may depend on active profiles' % model.pom_file)
+        return model
+
+    '''
+    dependencyManagement of a model, with import scoped boms expanded
+    (own entries win over imported ones).
+    '''
+    def managed_dependencies(self, model, visited = None):
+        if visited == None:
+            visited = set()
+        managed = {}
+        imports = []
+        for dependency in model.dependency_management:
+            if dependency.scope == 'import' and dependency.type == 'pom':
+                imports.append(dependency)
+            else:
+                managed[dependency.management_key()] = dependency
+        for dependency in imports:
+            bom_key = (dependency.groupId, dependency.artifactId, dependency.version)
+            if bom_key in visited:
+                continue
+            visited.add(bom_key)
+            bom_model = self.load_model(dependency.groupId, dependency.artifactId, dependency.version)
+            for key, bom_dependency in self.managed_dependencies(bom_model, visited).items():
+                if key not in managed:
+                    managed[key] = bom_dependency
+        return managed
+
+    def file_for(self, dependency):
+        extension, classifier = artifact_types.get(dependency.type or 'jar', (dependency.type, None))
+        classifier = dependency.classifier or classifier
+        artifact_file = self.artifact_path(dependency.groupId, dependency.artifactId, dependency.version, extension, classifier)
+        if not os.path.isfile(artifact_file):
+            raise ArtifactNotFound(repr(dependency))
+        return artifact_file
+
+    '''
+    Returns the ordered classpath (list of files) of the pom file's module.
+    '''
+    def resolve(self, pom_file):
+        root_model = self.check_profiles(pom.load_pom_model(pom_file, self.locate_pom))
+        root_managed = self.managed_dependencies(root_model)
+
+        classpath = []
+        resolved = set()
+        # breadth first: the first occurrence of an artifact is the nearest one
+        pending = deque()
+        for dependency in root_model.dependencies:
+            dependency = self.manage(dependency, root_managed, True)
+            pending.append((dependency, dependency.scope or 'compile', []))
+
+        while pending:
+            dependency, scope, exclusions = pending.popleft()
+            key = (dependency.groupId, dependency.artifactId, dependency.type or 'jar', dependency.classifier)
+            if key in resolved:
+                continue
+            resolved.add(key)
+
+            if scope == 'system':
+                if dependency.systemPath:
+                    classpath.append(dependency.systemPath)
+                continue
+
+            model = self.load_model(dependency.groupId, dependency.artifactId, dependency.version)
+            if (dependency.type or 'jar') != 'pom':
+                classpath.append(self.file_for(dependency))
+
+            child_exclusions = exclusions + dependency.exclusions
+            managed = self.managed_dependencies(model)
+            for child in model.dependencies:
+                child = self.manage(child, managed, False)
+                if child.optional or is_excluded(child, child_exclusions):
+                    continue
+                # whether a dependency is transitive depends on its own scope only
+                child_scope = transitive_scopes[scope].get(child.scope or 'compile')
+                if child_scope == None:
+                    continue
+                root_managed_dependency = root_managed.get(child.management_key())
+                if root_managed_dependency and root_managed_dependency.scope:
+                    # the root's dependencyManagement sets the scope of transitive dependencies too
+                    child_scope = root_managed_dependency.scope
+                pending.append((self.manage(child, root_managed, True), child_scope, child_exclusions))
+        return classpath
+
+    '''
+    Applies dependencyManagement to a dependency; the root module's
+    management overrides versions of transitive dependencies as well.
+    '''
+    def manage(self, dependency, managed, override):
+        managed_dependency = managed.get(dependency.management_key())
+        if not managed_dependency:
+            return dependency
+        dependency = dependency.copy()
+        if override or not dependency.version:
+            dependency.version = managed_dependency.version or dependency.version
+        if not dependency.scope:
+            dependency.scope = managed_dependency.scope
+        if not dependency.exclusions:
+            dependency.exclusions = managed_dependency.exclusions[:]
+        return dependency
+
+def is_excluded(dependency, exclusions):
+    for group_id, artifact_id in exclusions:
+        if group_id in ('*', dependency.groupId) and artifact_id in ('*', dependency.artifactId):
+            return True
+    return False
+
+'''
+Classpath of the module at pom_path resolved offline from the local repository.
+Raises ArtifactNotFound when mvn has to be used instead.
+'''
+def resolve_classpath(pom_path, m2_settings = None):
+    resolver = LocalRepositoryResolver(find_local_repository(m2_settings))
+    return resolver.resolve(os.path.join(pom_path, 'pom.xml'))
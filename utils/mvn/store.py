@@ -0,0 +1,72 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+import os, json, threading
+
+'''
+JsonStore: thread-safe dict of entries persisted as a single json file.
+The file is read on creation (an unreadable one is ignored) and written
+back by save() only when put() changed something.  description names the
+store in that warning.
+'''
+class JsonStore(object):
+    description = 'store'
+
+    def __init__(self, store_file):
+        self.store_file = store_file
+        self.entries = {}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        if not self.store_file or not os.path.isfile(self.store_file):
+            return
+        store_file_obj = open(self.store_file, 'r')
+        try:
+            self.entries = json.load(store_file_obj)
+        except ValueError:
+            # corrupt file, start over
+            print 'WARNING: ignoring unreadable %s %s' % (self.description, self.store_file)
+            self.entries = {}
+        store_file_obj.close()
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.dirty = True
+
+    def save(self):
+        with self.lock:
+            if not self.dirty or not self.store_file:
+                return
+            store_dir = os.path.dirname(self.store_file)
+            if store_dir and not os.path.isdir(store_dir):
+                os.makedirs(store_dir)
+            store_file_obj = open(self.store_file, 'w')
+            json.dump(self.entries, store_file_obj)
+            store_file_obj.close()
+            self.dirty = False
@@ -0,0 +1,120 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os, threading
+
+# conventional source roots of a module (relative to its pom directory)
+main_source_root = os.path.join('src', 'main', 'java')
+test_source_root = os.path.join('src', 'test', 'java')
+
+# surefire's default includes: Test*, *Test, *Tests and *TestCase
+test_name_patterns = ['Test%s', '%sTest', '%sTests', '%sTestCase']
+
+def is_test_class_name(simple_name):
+    return simple_name.startswith('Test') or simple_name.endswith('Test') \
+        or simple_name.endswith('Tests') or simple_name.endswith('TestCase')
+
+'''
+Index of the test classes of one module: simple class name -> fully qualified
+names, with the package taken from the directory layout under src/test/java.
+'''
+class TestSourceIndex(object):
+    def __init__(self, module_dir):
+        self.module_dir = module_dir
+        self.classes = {}
+        test_root = os.path.join(module_dir, test_source_root)
+        for dirname, dirnames, filenames in os.walk(test_root):
+            dirnames[:] = [name for name in dirnames if name[0] != '.']
+            package = os.path.relpath(dirname, test_root).replace(os.sep, '.')
+            for filename in filenames:
+                simple_name, ext = os.path.splitext(filename)
+                if ext != '.java' or not is_test_class_name(simple_name):
+                    continue
+                if package == '.':
+                    self.classes.setdefault(simple_name, []).append(simple_name)
+                else:
+                    self.classes.setdefault(simple_name, []).append(package + '.' + simple_name)
+
+    def contains(self, class_name):
+        return class_name in self.classes.get(class_name.split('.')[-1], [])
+
+    '''
+    Test classes for a class name, by naming convention; tests in the same
+    package win over equally named tests elsewhere.
+    '''
+    def tests_for(self, class_name):
+        package, dot, simple_name = class_name.rpartition('.')
+        tests = []
+        for pattern in test_name_patterns:
+            candidates = self.classes.get(pattern % simple_name, [])
+            same_package = [candidate for candidate in candidates if candidate.rpartition('.')[0] == package]
+            tests += same_package or candidates
+        return tests
+
+# module dir -> TestSourceIndex, dropped by invalidate_test_index() when a new test appears
+test_index_cache = {}
+test_index_cache_lock = threading.Lock()
+
+def get_test_index(module_dir):
+    with test_index_cache_lock:
+        index = test_index_cache.get(module_dir)
+    if index == None:
+        index = TestSourceIndex(module_dir)
+        with test_index_cache_lock:
+            test_index_cache[module_dir] = index
+    return index
+
+def invalidate_test_index(module_dir):
+    with test_index_cache_lock:
+        test_index_cache.pop(module_dir, None)
+
+'''
+Fully qualified class name of a source file from its place under the main or
+test source root of module_dir, or None for files outside of them.
+'''
+def source_class_name(source_file, module_dir):
+    for root in [main_source_root, test_source_root]:
+        root_dir = os.path.join(module_dir, root)
+        if source_file.startswith(root_dir + os.sep):
+            return os.path.splitext(os.path.relpath(source_file, root_dir))[0].replace(os.sep, '.')
+    return None
+
+'''
+The test classes to run after source_file (of the module at module_dir)
+changed: the file itself for a test, the conventionally named tests of
+its class otherwise.
+'''
+def find_test_classes(source_file, module_dir):
+    class_name = source_class_name(source_file, module_dir)
+    if class_name == None:
+        return []
+    index = get_test_index(module_dir)
+    if source_file.startswith(os.path.join(module_dir, test_source_root) + os.sep):
+        if not index.contains(class_name) and is_test_class_name(class_name.split('.')[-1]):
+            # a test written since the index was built
+            invalidate_test_index(module_dir)
+            index = get_test_index(module_dir)
+        if index.contains(class_name):
+            return [class_name]
+        return []
+    return index.tests_for(class_name)
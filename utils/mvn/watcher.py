@@ -0,0 +1,370 @@
+# All of SublimeMaven is licensed under the MIT license.
+
+#   Copyright (c) 2012 Nick Lloyd
+
+#   Permission is hereby granted, free of charge, to any person obtaining a copy
+#   of this software and associated documentation files (the "Software"), to deal
+#   in the Software without restriction, including without limitation the rights
+#   to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#   copies of the Software, and to permit persons to whom the Software is
+#   furnished to do so, subject to the following conditions:
+
+#   The above copyright notice and this permission notice shall be included in
+#   all copies or substantial portions of the Software.
+
+#   THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+#   IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+#   FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+#   AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+#   LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+#   OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+#   THE SOFTWARE.
+
+
+import os, sys, threading, time, struct, select, errno, fnmatch
+from utils.mvn import pom
+
+'''
+What the index knows of one pom.xml: its mtime, coordinates and the
+directories of the modules it declares.
+'''
+class PomEntry(object):
+    def __init__(self, pom_dir):
+        self.pom_dir = pom_dir
+        pom_file = os.path.join(pom_dir, 'pom.xml')
+        self.mtime = os.path.getmtime(pom_file)
+        self.groupId = self.artifactId = self.version = None
+        self.modules = []
+        try:
+            model = pom.read_pom_model(pom_file)
+        except Exception:
+            # unreadable pom (being edited?): still a pom root
+            return
+        self.groupId = model.groupId or (model.parent or {}).get('groupId')
+        self.artifactId = model.artifactId
+        self.version = model.version or (model.parent or {}).get('version')
+        self.modules = [os.path.normpath(os.path.join(pom_dir, module)) for module in model.modules]
+
+    def coordinates(self):
+        return (self.groupId, self.artifactId, self.version)
+
+'''
+PomIndex: live set of the pom roots under the watched folders, kept up to
+date by a PomWatcherThread.  Queries answer from memory; they return None
+(or (False, None) for nearest) for paths outside of the scanned folders,
+for which callers go to the filesystem as before.
+'''
+class PomIndex(object):
+    def __init__(self, exclude_patterns = None):
+        self.exclude_patterns = exclude_patterns or pom.default_exclude_patterns
+        self.lock = threading.Lock()
+        # folders scanned at least once
+        self.folders = set()
+        # pom dir -> PomEntry
+        self.poms = {}
+
+    def is_excluded(self, name):
+        for pattern in self.exclude_patterns:
+            if fnmatch.fnmatch(name, pattern):
+                return True
+        return False
+
+    def folder_of(self, path):
+        for folder in self.folders:
+            if path == folder or path.startswith(folder + os.sep):
+                return folder
+        return None
+
+    '''
+    Walks folder (skipping excluded directories), indexing every pom.xml in
+    it, and returns the directories walked.
+    '''
+    def scan(self, folder):
+        dirnames_walked = []
+        found = {}
+        for dirname, dirnames, filenames in os.walk(folder):
+            dirnames[:] = [name for name in dirnames if not self.is_excluded(name)]
+            dirnames_walked.append(dirname)
+            if 'pom.xml' in filenames:
+                with self.lock:
+                    entry = self.poms.get(dirname)
+                try:
+                    if entry == None or entry.mtime != os.path.getmtime(os.path.join(dirname, 'pom.xml')):
+                        entry = PomEntry(dirname)
+                except OSError:
+                    continue
+                found[dirname] = entry
+        with self.lock:
+            for pom_dir in [pom_dir for pom_dir in self.poms if pom_dir == folder or pom_dir.startswith(folder + os.sep)]:
+                if pom_dir not in found:
+                    del self.poms[pom_dir]
+            self.poms.update(found)
+        return dirnames_walked
+
+    '''
+    Forgets every folder, so that all queries go to the filesystem again.
+    '''
+    def disable(self):
+        with self.lock:
+            self.folders.clear()
+            self.poms.clear()
+
+    def add_folder(self, folder):
+        dirnames_walked = self.scan(folder)
+        with self.lock:
+            self.folders.add(folder)
+        return dirnames_walked
+
+    def remove_folder(self, folder):
+        with self.lock:
+            self.folders.discard(folder)
+            for pom_dir in [pom_dir for pom_dir in self.poms if self.folder_of(pom_dir) == None]:
+                del self.poms[pom_dir]
+
+    '''
+    Re-reads (or forgets) the pom.xml of pom_dir.
+    '''
+    def refresh(self, pom_dir):
+        try:
+            entry = PomEntry(pom_dir)
+        except OSError:
+            entry = None
+        with self.lock:
+            if entry:
+                self.poms[pom_dir] = entry
+            else:
+                self.poms.pop(pom_dir, None)
+        if entry:
+            pom.invalidate_pom_cache()
+
+    def remove_tree(self, dirname):
+        with self.lock:
+            for pom_dir in [pom_dir for pom_dir in self.poms if pom_dir == dirname or pom_dir.startswith(dirname + os.sep)]:
+                del self.poms[pom_dir]
+        pom.invalidate_pom_cache()
+
+    '''
+    (True, nearest pom root at or above path) when the index covers path,
+    (False, None) when the filesystem has to be searched: paths above the
+    folders and paths under an excluded directory, whose poms were not indexed.
+    '''
+    def nearest(self, path):
+        path = os.path.normpath(path)
+        with self.lock:
+            folder = self.folder_of(path)
+            if folder == None:
+                return (False, None)
+            cur_path = path
+            while True:
+                if cur_path in self.poms:
+                    return (True, cur_path)
+                if cur_path == folder:
+                    # the pom root may be above the folder
+                    return (False, None)
+                if self.is_excluded(os.path.basename(cur_path)):
+                    return (False, None)
+                cur_path = os.path.dirname(cur_path)
+
+    '''
+    Sorted pom directories under root_path, as pom.discover_pom_paths would
+    find them, or None if the index cannot tell.
+    '''
+    def pom_paths(self, root_path, exclude_patterns = None, stop_at_leaf_modules = False):
+        root_path = os.path.normpath(root_path)
+        if (exclude_patterns or pom.default_exclude_patterns) != self.exclude_patterns:
+            return None
+        with self.lock:
+            if self.folder_of(root_path) == None:
+                return None
+            pom_dirs = sorted([pom_dir for pom_dir in self.poms
+                if pom_dir == root_path or pom_dir.startswith(root_path + os.sep)])
+            if not stop_at_leaf_modules:
+                return pom_dirs
+            leaves = [pom_dir for pom_dir in pom_dirs if not self.poms[pom_dir].modules]
+        # nothing is found below a pom without modules
+        return [pom_dir for pom_dir in pom_dirs
+            if not [leaf for leaf in leaves if pom_dir.startswith(leaf + os.sep)]]
+
+    def coordinates(self, pom_dir):
+        with self.lock:
+            entry = self.poms.get(os.path.normpath(pom_dir))
+        if entry:
+            return entry.coordinates()
+        return None
+
+    def modules(self, pom_dir):
+        with self.lock:
+            entry = self.poms.get(os.path.normpath(pom_dir))
+        if entry:
+            return entry.modules[:]
+        return None
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+inotify_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+inotify_event_header = struct.Struct('iIII')
+
+'''
+Minimal inotify(7) binding through ctypes (Linux only): one watch per
+directory, events read as (directory, name, mask).
+'''
+class Inotify(object):
+    def __init__(self):
+        import ctypes, ctypes.util
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init failed')
+        self.get_errno = ctypes.get_errno
+        # watch descriptor -> directory, and back
+        self.dirs = {}
+        self.watches = {}
+
+    def add_watch(self, dirname):
+        wd = self.libc.inotify_add_watch(self.fd, pom.encode_path(dirname), inotify_mask)
+        if wd < 0:
+            raise OSError(self.get_errno(), 'cannot watch %s' % dirname)
+        self.dirs[wd] = dirname
+        self.watches[dirname] = wd
+
+    def remove_watches(self, dirname):
+        for watched in [watched for watched in self.watches if watched == dirname or watched.startswith(dirname + os.sep)]:
+            wd = self.watches.pop(watched)
+            self.dirs.pop(wd, None)
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self, timeout):
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        data = os.read(self.fd, 2**16)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, name_length = inotify_event_header.unpack_from(data, offset)
+            offset += inotify_event_header.size
+            name = data[offset:offset + name_length].rstrip('\0')
+            offset += name_length
+            if mask & IN_IGNORED:
+                dirname = self.dirs.pop(wd, None)
+                if dirname:
+                    self.watches.pop(dirname, None)
+                continue
+            events.append((self.dirs.get(wd), name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+'''
+Keeps a PomIndex up to date for a set of folders: with inotify where it
+is available, else (or when the watch limit is hit) by rescanning every
+poll_interval seconds if one is given.  Without either the index cannot be
+kept live: can_watch() is False, and an index already in use is disabled.
+'''
+class PomWatcherThread(threading.Thread):
+    def __init__(self, index, poll_interval = None):
+        self.index = index
+        self.poll_interval = poll_interval
+        self.lock = threading.Lock()
+        self.wanted_folders = set()
+        self.stopped = False
+        self.inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                self.inotify = Inotify()
+            except (OSError, AttributeError, ImportError) as e:
+                print 'WARNING: inotify unavailable (%s)' % e
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+    def can_watch(self):
+        return self.inotify != None or bool(self.poll_interval)
+
+    def stop_inotify(self, reason):
+        self.inotify.close()
+        self.inotify = None
+        if self.poll_interval:
+            print 'WARNING: %s, polling for pom.xml changes' % reason
+        else:
+            print 'WARNING: %s, pom index disabled' % reason
+            self.index.disable()
+            self.stopped = True
+
+    def set_folders(self, folders):
+        with self.lock:
+            self.wanted_folders = set([os.path.normpath(folder) for folder in folders])
+
+    def stop(self):
+        self.stopped = True
+
+    def run(self):
+        last_poll = 0
+        while not self.stopped:
+            self.sync_folders()
+            if self.inotify:
+                try:
+                    self.handle_events(self.inotify.read_events(1))
+                except (OSError, select.error) as e:
+                    self.stop_inotify('inotify failed (%s)' % e)
+            elif self.poll_interval:
+                if time.time() - last_poll >= self.poll_interval:
+                    for folder in list(self.index.folders):
+                        self.index.scan(folder)
+                    last_poll = time.time()
+                time.sleep(1)
+        if self.inotify:
+            self.inotify.close()
+
+    def sync_folders(self):
+        with self.lock:
+            wanted_folders = set(self.wanted_folders)
+        for folder in self.index.folders - wanted_folders:
+            self.index.remove_folder(folder)
+            if self.inotify:
+                self.inotify.remove_watches(folder)
+        for folder in wanted_folders - self.index.folders:
+            if self.stopped:
+                return
+            self.watch(self.index.add_folder(folder))
+
+    def watch(self, dirnames):
+        if not self.inotify:
+            return
+        try:
+            for dirname in dirnames:
+                self.inotify.add_watch(dirname)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                # most likely fs.inotify.max_user_watches
+                self.stop_inotify(str(e))
+
+    def handle_events(self, events):
+        for dirname, name, mask in events:
+            if mask & IN_Q_OVERFLOW:
+                for folder in list(self.index.folders):
+                    self.index.scan(folder)
+                continue
+            if dirname == None:
+                continue
+            if isinstance(dirname, unicode):
+                # same type as the paths os.walk gave for the folder
+                name = name.decode(sys.getfilesystemencoding())
+            path = os.path.join(dirname, name)
+            if mask & IN_ISDIR:
+                if self.index.is_excluded(name):
+                    continue
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.watch(self.index.scan(path))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    self.index.remove_tree(path)
+                    if self.inotify:
+                        self.inotify.remove_watches(path)
+            elif name == 'pom.xml':
+                self.index.refresh(dirname)